@@ -3,14 +3,46 @@
 Mental Health Check-in Chatbot
 A terminal-based chatbot that guides users through personalized mental health check-ins
 using GAD-7 protocol and CBT techniques with ChromaDB vector search.
+
+Heavy modules (chromadb, the openai SDK) are imported on first use, and the
+vector database is opened while the user writes their journal entry, so the
+first prompt appears as soon as the API key has been checked.
 """
 
+import argparse
+import json
 import os
 import sys
-import chromadb
-import openai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from embeddings import EmbeddingMismatchError, OpenAIEmbeddingBackend
+from gad7_scoring import (DEFAULT_CONFIDENCE_THRESHOLD, ScoreCache, get_local_scorer, scoring_fingerprint,
+                          scoring_stats)
+from lexical_index import get_lexical_index, reciprocal_rank_fusion
+from openai_transport import get_openai_client
+from protocol_index import load_protocol_index
+from tracing import current_span, span
+
+# GAD-7 questions search terms
+GAD7_QUESTION_TOPICS = [
+    "feeling nervous, anxious, or on edge",
+    "being able to stop or control your worrying",
+    "worrying too much about different things",
+    "trouble relaxing",
+    "feeling so restless that it's hard to sit still",
+    "becoming easily annoyed or irritable",
+    "feeling afraid, as if something awful might happen"
+]
+
+# "chroma" opens ./db with chromadb; "snapshot" memory-maps the read-only export from build_database.py
+VECTOR_BACKEND = os.getenv('VECTOR_BACKEND', 'chroma')
+CHROMA_PATH = "./db"
+
+GENERAL_CBT_STRATEGY = "- **General Strategy:** When feeling overwhelmed, try the 5-4-3-2-1 grounding technique. Name 5 things you can see, 4 you can touch, 3 you can hear, 2 you can smell, and 1 you can taste."
+
 def setup_environment():
     """Setup environment and load configurations"""
     print("🔧 Setting up mental health chatbot...")
@@ -32,52 +64,180 @@ def setup_environment():
     print("✓ OpenAI API key loaded successfully")
     return api_key
 
-def initialize_chromadb():
-    """Initialize ChromaDB client and get the mental health support collection"""
+def initialize_chromadb(embedding_backend, log=print):
+    """Initialize ChromaDB client and get the mental health support collection
+    
+    The collection is opened without an embedding function, so queries must
+    pass query_embeddings from embedding_backend and Chroma never loads its
+    default local model. The collection's recorded embedding model is checked
+    against the backend before use. Progress and error messages go to log;
+    errors exit.
+    """
     try:
+        # Imported here because chromadb is by far the slowest module to load
+        import chromadb
+        
         # Initialize persistent ChromaDB client
-        client = chromadb.PersistentClient(path="./db")
-        print("✓ ChromaDB client initialized successfully")
+        client = chromadb.PersistentClient(path=CHROMA_PATH)
+        log("✓ ChromaDB client initialized successfully")
         
         # Get the existing mental health support collection
         try:
-            collection = client.get_collection("mental_health_support")
+            collection = client.get_collection("mental_health_support", embedding_function=None)
             document_count = collection.count()
-            print(f"✓ Connected to 'mental_health_support' collection ({document_count} documents)")
-            return collection
+            log(f"✓ Connected to 'mental_health_support' collection ({document_count} documents)")
         except Exception as e:
-            print(f"❌ Error: Could not find 'mental_health_support' collection: {e}")
-            print("Please run 'python build_database.py' first to create the vector database")
+            log(f"❌ Error: Could not find 'mental_health_support' collection: {e}")
+            log("Please run 'python build_database.py' first to create the vector database")
             sys.exit(1)
+        
+        try:
+            embedding_backend.check_collection(collection)
+        except EmbeddingMismatchError as e:
+            log(f"❌ Error: {e}")
+            log("Please re-run 'python build_database.py' with the same embedding settings")
+            sys.exit(1)
+        
+        log(f"✓ Using {embedding_backend.model} for query embeddings")
+        return collection
             
     except Exception as e:
-        print(f"❌ Error initializing ChromaDB: {e}")
+        log(f"❌ Error initializing ChromaDB: {e}")
         sys.exit(1)
 
-def initialize_openai_client(api_key):
-    """Initialize OpenAI client"""
+def initialize_vector_snapshot(embedding_backend, log=print):
+    """Open the memory-mapped vector snapshot as a read-only, Chroma-compatible collection
+    
+    Avoids importing chromadb at all; every app process maps the same file,
+    so the vectors are shared through the page cache.
+    """
     try:
-        client = openai.OpenAI(api_key=api_key)
-        print("✓ OpenAI client initialized successfully")
-        return client
+        from vector_snapshot import VECTOR_SNAPSHOT_PATH, SnapshotCollection
+        collection = SnapshotCollection(VECTOR_SNAPSHOT_PATH)
     except Exception as e:
-        print(f"❌ Error initializing OpenAI client: {e}")
+        log(f"❌ Error: Could not open vector snapshot: {e}")
+        log("Please run 'python build_database.py' first to export the snapshot")
         sys.exit(1)
+    
+    try:
+        embedding_backend.check_collection(collection)
+    except EmbeddingMismatchError as e:
+        log(f"❌ Error: {e}")
+        log("Please re-run 'python build_database.py' with the same embedding settings")
+        sys.exit(1)
+    
+    log(f"✓ Mapped vector snapshot {VECTOR_SNAPSHOT_PATH} ({collection.count()} documents)")
+    log(f"✓ Using {embedding_backend.model} for query embeddings")
+    return collection
 
-def search_knowledge_base(collection, query, n_results=3):
-    """Search the knowledge base for relevant information"""
+def initialize_openai_client(api_key, log=print):
+    """Initialize the shared, pooled OpenAI client with timeouts and retry backoff"""
     try:
-        results = collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        return results
+        client = get_openai_client(api_key)
+        log("✓ OpenAI client initialized successfully")
+        return client
     except Exception as e:
-        print(f"⚠️  Error searching knowledge base: {e}")
-        return None
+        log(f"❌ Error initializing OpenAI client: {e}")
+        sys.exit(1)
+
+def query_collection(collection, embedding_backend, query, n_results, purpose):
+    """Embed query and run collection.query, tracing the Chroma call separately from the embedding"""
+    query_embeddings = embedding_backend.embed([query])
+    with span('chroma.query', purpose=purpose, n_results=n_results):
+        return collection.query(query_embeddings=query_embeddings, n_results=n_results)
+
+# Candidates taken from each ranking before hybrid fusion, per requested result
+HYBRID_CANDIDATE_FACTOR = 3
+
+def hybrid_search(collection, embedding_backend, lexical_index, query, n_results, purpose='search'):
+    """Fuse vector and BM25 rankings with reciprocal rank fusion; returns a Chroma-style result dict
+    
+    The result has a 'scores' list (fused scores, higher is better) in place
+    of distances.
+    """
+    candidate_count = n_results * HYBRID_CANDIDATE_FACTOR
+    vector_results = query_collection(collection, embedding_backend, query, candidate_count, purpose)
+    with span('lexical.search', purpose=purpose, hybrid=True):
+        lexical_ranking = [chunk_id for chunk_id, _ in lexical_index.search_chunks(query, candidate_count)]
+    
+    documents = dict(zip(vector_results['ids'][0], vector_results['documents'][0]))
+    metadatas = dict(zip(vector_results['ids'][0], vector_results['metadatas'][0]))
+    fused = reciprocal_rank_fusion([vector_results['ids'][0], lexical_ranking])[:n_results]
+    
+    # Chunks found only lexically still need their documents
+    missing_ids = [chunk_id for chunk_id, _ in fused if chunk_id not in documents]
+    if missing_ids:
+        extra = collection.get(ids=missing_ids, include=['documents', 'metadatas'])
+        documents.update(zip(extra['ids'], extra['documents']))
+        metadatas.update(zip(extra['ids'], extra['metadatas']))
+    
+    fused = [(chunk_id, score) for chunk_id, score in fused if chunk_id in documents]
+    return {
+        'ids': [[chunk_id for chunk_id, _ in fused]],
+        'documents': [[documents[chunk_id] for chunk_id, _ in fused]],
+        'metadatas': [[metadatas[chunk_id] for chunk_id, _ in fused]],
+        'scores': [[score for _, score in fused]]
+    }
+
+def search_knowledge_base(collection, embedding_backend, query, n_results=3, mode='vector', purpose='search'):
+    """Search the knowledge base for relevant information
+    
+    mode='hybrid' fuses vector results with the BM25 lexical index when
+    build_database.py has built one, and falls back to vector search otherwise.
+    purpose labels the traced queries. Returns None on errors.
+    """
+    with span('search_knowledge_base', n_results=n_results, mode=mode):
+        try:
+            lexical_index = get_lexical_index() if mode == 'hybrid' else None
+            if lexical_index:
+                return hybrid_search(collection, embedding_backend, lexical_index, query, n_results, purpose)
+            return query_collection(collection, embedding_backend, query, n_results, purpose)
+        except Exception as e:
+            print(f"⚠️  Error searching knowledge base: {e}")
+            return None
+
+def stream_chat_completion(openai_client, on_token=None, **request):
+    """Run a streaming chat completion, passing each token to on_token as it arrives
+    
+    Returns (text, timings) where timings has time_to_first_token and
+    total_time in seconds. Errors mid-stream are raised to the caller.
+    """
+    start_time = time.perf_counter()
+    first_token_time = None
+    parts = []
+    
+    with span('openai.chat.completions.stream', model=request.get('model')) as current:
+        # include_usage adds a final chunk with token counts and no choices
+        stream = openai_client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **request)
+        for chunk in stream:
+            usage = getattr(chunk, 'usage', None)
+            if usage:
+                current.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if not token:
+                continue
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+            parts.append(token)
+            if on_token:
+                on_token(token)
+        
+        end_time = time.perf_counter()
+        timings = {
+            'time_to_first_token': (first_token_time or end_time) - start_time,
+            'total_time': end_time - start_time
+        }
+        current.set(time_to_first_token_ms=round(timings['time_to_first_token'] * 1000, 1))
+    return "".join(parts), timings
 
-def generate_response(openai_client, user_input, context_documents):
-    """Generate AI response using OpenAI with context from knowledge base"""
+def generate_response(openai_client, user_input, context_documents, on_token=None):
+    """Generate AI response using OpenAI with context from knowledge base
+    
+    If on_token is given the response is streamed and each token is passed
+    to it as it arrives; the full text is still returned.
+    """
     try:
         # Prepare context from retrieved documents
         context = ""
@@ -98,12 +258,25 @@ Guidelines:
 - Always remind users that this is not a replacement for professional therapy
 - Keep responses concise but meaningful"""
 
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_input}
+        ]
+        
+        if on_token:
+            response_text, _ = stream_chat_completion(
+                openai_client,
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=300,
+                temperature=0.7,
+                on_token=on_token
+            )
+            return response_text
+        
         response = openai_client.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input}
-            ],
+            messages=messages,
             max_tokens=300,
             temperature=0.7
         )
@@ -140,19 +313,20 @@ def stage1_journaling():
     print("✍️  Start writing (press Enter twice to finish):")
     
     empty_line_count = 0
-    while True:
-        try:
-            line = input()
-            if line.strip() == "":
-                empty_line_count += 1
-                if empty_line_count >= 2:
-                    break
-            else:
-                empty_line_count = 0
-                journal_lines.append(line)
-        except KeyboardInterrupt:
-            print("\n⚠️  Journaling interrupted. Let's continue with what you've shared so far.")
-            break
+    with span('user.input', stage='journaling'):
+        while True:
+            try:
+                line = input()
+                if line.strip() == "":
+                    empty_line_count += 1
+                    if empty_line_count >= 2:
+                        break
+                else:
+                    empty_line_count = 0
+                    journal_lines.append(line)
+            except KeyboardInterrupt:
+                print("\n⚠️  Journaling interrupted. Let's continue with what you've shared so far.")
+                break
     
     # Join the journal entry
     journal_entry = "\n".join(journal_lines).strip()
@@ -169,10 +343,9 @@ def stage1_journaling():
     print("\n🌱 Remember: Taking time to reflect is already a positive step for your mental health.")
     return journal_entry
 
-def get_gad7_score(openai_client, user_answer):
-    """Use OpenAI to classify user's answer into GAD-7 score (0-3)"""
-    try:
-        prompt = f"""Based on the GAD-7 scoring rules, classify the user's answer: "{user_answer}" into a score of 0, 1, 2, or 3. 
+GAD7_SCORING_MODEL = "gpt-3.5-turbo"
+GAD7_SCORING_SYSTEM_PROMPT = "You are a clinical assessment tool. Only return the numeric score (0, 1, 2, or 3)."
+GAD7_SCORING_PROMPT = """Based on the GAD-7 scoring rules, classify the user's answer: "{user_answer}" into a score of 0, 1, 2, or 3. 
 
 Scoring rules:
 - 0 = Not at all, never, nope
@@ -182,10 +355,81 @@ Scoring rules:
 
 Return only the number (0, 1, 2, or 3)."""
 
+GAD7_BATCH_SCORING_SYSTEM_PROMPT = "You are a clinical assessment tool. Only return JSON."
+GAD7_BATCH_SCORING_PROMPT = """Based on the GAD-7 scoring rules, classify each of the user's numbered answers below into a score of 0, 1, 2, or 3.
+
+Scoring rules:
+- 0 = Not at all, never, nope
+- 1 = Several days, sometimes, a little bit, a few days
+- 2 = More than half the days, often, a lot
+- 3 = Nearly every day, constantly, all the time
+
+Answers:
+{numbered_answers}
+
+Return only a JSON object of the form {{"scores": [...]}} with exactly {count} integers, one per answer, in order."""
+
+_gad7_score_cache = None
+_gad7_score_cache_lock = threading.Lock()
+
+def get_gad7_score_cache():
+    """Return the shared GAD-7 score cache, opening it on first use"""
+    global _gad7_score_cache
+    with _gad7_score_cache_lock:
+        if _gad7_score_cache is None:
+            _gad7_score_cache = ScoreCache(
+                # Batched and single-answer scores share the cache, so both prompts count
+                scoring_fingerprint(GAD7_SCORING_MODEL, GAD7_SCORING_SYSTEM_PROMPT, GAD7_SCORING_PROMPT,
+                                    GAD7_BATCH_SCORING_SYSTEM_PROMPT, GAD7_BATCH_SCORING_PROMPT)
+            )
+        return _gad7_score_cache
+
+def get_gad7_score(openai_client, user_answer, confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD):
+    """Classify user's answer into GAD-7 score (0-3)
+    
+    Clear answers are scored by the local rule-based scorer, and answers the
+    model has scored before come from the score cache; only new, ambiguous
+    answers are sent to OpenAI.
+    """
+    with span('get_gad7_score') as current:
+        score, _ = score_without_model(user_answer, confidence_threshold, current)
+        if score is not None:
+            return score
+        
+        scoring_stats.record('llm')
+        current.set(source='llm')
+        return request_gad7_score(openai_client, user_answer)
+
+def score_without_model(user_answer, confidence_threshold, current):
+    """Score an answer locally or from the cache; returns (score, source) or (None, None)"""
+    local_score, confidence = get_local_scorer().classify(user_answer)
+    if local_score is not None and confidence >= confidence_threshold:
+        scoring_stats.record('local')
+        current.set(source='local')
+        return local_score, 'local'
+    
+    cached_score = get_gad7_score_cache().get(user_answer)
+    current.set(cache_hit=cached_score is not None)
+    if cached_score is not None:
+        scoring_stats.record('cache')
+        current.set(source='cache')
+        return cached_score, 'cache'
+    
+    return None, None
+
+def request_gad7_score(openai_client, user_answer, raise_errors=False):
+    """Ask the model to score one answer, caching valid scores; returns 0 on errors
+    
+    With raise_errors, API errors and invalid replies are raised instead, so
+    batch runs can record them rather than store a made-up score.
+    """
+    try:
+        prompt = GAD7_SCORING_PROMPT.format(user_answer=user_answer)
+
         response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=GAD7_SCORING_MODEL,
             messages=[
-                {"role": "system", "content": "You are a clinical assessment tool. Only return the numeric score (0, 1, 2, or 3)."},
+                {"role": "system", "content": GAD7_SCORING_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=1,
@@ -193,15 +437,241 @@ Return only the number (0, 1, 2, or 3)."""
         )
         
         score_text = response.choices[0].message.content.strip()
-        score = int(score_text) if score_text.isdigit() and score_text in ['0', '1', '2', '3'] else 0
-        return score
+        if score_text in ['0', '1', '2', '3']:
+            score = int(score_text)
+            get_gad7_score_cache().put(user_answer, score)
+            return score
+        if raise_errors:
+            raise ValueError(f"invalid GAD-7 score reply: {score_text!r}")
+        return 0
     
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"⚠️  Error getting GAD-7 score: {e}")
         return 0
 
-def stage2_gad7_assessment(collection, openai_client):
-    """Stage 2: GAD-7 Assessment - Conduct anxiety screening"""
+def parse_batch_scores(reply_text, count):
+    """Return the list of count scores (0-3) from a batch scoring reply, or None if it is malformed"""
+    try:
+        reply = json.loads(reply_text)
+    except (TypeError, ValueError):
+        return None
+    scores = reply.get('scores') if isinstance(reply, dict) else reply
+    if not isinstance(scores, list) or len(scores) != count:
+        return None
+    if not all(type(score) is int and 0 <= score <= 3 for score in scores):
+        return None
+    return scores
+
+def get_gad7_scores(openai_client, user_answers, confidence_threshold=DEFAULT_CONFIDENCE_THRESHOLD,
+                    raise_errors=False):
+    """Classify a full set of answers at once; returns a list of scores (0-3) in answer order
+    
+    Answers the local scorer or the score cache can handle are scored without
+    the model, and all remaining answers go to OpenAI in a single request that
+    returns a JSON vector of scores. If that reply is malformed, each of those
+    answers is scored with its own request instead. With raise_errors, a
+    failed request raises instead of falling back or scoring 0.
+    """
+    with span('get_gad7_scores', answers=len(user_answers)) as current:
+        scores = []
+        pending = []
+        for index, user_answer in enumerate(user_answers):
+            with span('get_gad7_score', batched=True) as item_span:
+                score, _ = score_without_model(user_answer, confidence_threshold, item_span)
+                if score is None:
+                    item_span.set(source='llm')
+            scores.append(score)
+            if score is None:
+                pending.append(index)
+        
+        current.set(sent_to_model=len(pending))
+        if not pending:
+            return scores
+        for _ in pending:
+            scoring_stats.record('llm')
+        
+        batch_scores = None
+        numbered_answers = "\n".join(f"{number}. {json.dumps(user_answers[index])}"
+                                     for number, index in enumerate(pending, 1))
+        try:
+            response = openai_client.chat.completions.create(
+                model=GAD7_SCORING_MODEL,
+                messages=[
+                    {"role": "system", "content": GAD7_BATCH_SCORING_SYSTEM_PROMPT},
+                    {"role": "user", "content": GAD7_BATCH_SCORING_PROMPT.format(
+                        numbered_answers=numbered_answers, count=len(pending))}
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=20 + 4 * len(pending),
+                temperature=0
+            )
+            batch_scores = parse_batch_scores(response.choices[0].message.content, len(pending))
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"⚠️  Error getting batched GAD-7 scores: {e}")
+        
+        if batch_scores is None:
+            # Malformed or failed batch reply: score those answers one at a time
+            current.set(fallback=True)
+            batch_scores = [request_gad7_score(openai_client, user_answers[index], raise_errors)
+                            for index in pending]
+        else:
+            for index, score in zip(pending, batch_scores):
+                get_gad7_score_cache().put(user_answers[index], score)
+        
+        for index, score in zip(pending, batch_scores):
+            scores[index] = score
+        return scores
+
+def extract_quoted_text(line):
+    """Return the text between the first and last double quote of a line, or None"""
+    start = line.find('"') + 1
+    end = line.rfind('"')
+    if start > 0 and end > start:
+        return line[start:end]
+    return None
+
+def find_question_lines(lexical_index, question_topic, n_results=5):
+    """Indexes of protocol question lines about question_topic, best first
+    
+    Lines containing the topic as an exact phrase come first, then the best
+    BM25 matches.
+    """
+    with span('lexical.search', purpose='question'):
+        line_indexes = lexical_index.find_phrase(question_topic, require="Question:")
+        for line_index, _ in lexical_index.search_lines(question_topic, n_results, require="Question:"):
+            if line_index not in line_indexes:
+                line_indexes.append(line_index)
+        return line_indexes[:n_results]
+
+def find_symptom_chunk(collection, kind, symptom_index):
+    """Return the 'question' or 'strategy' chunk tagged with symptom_index, or None
+    
+    build_database.py stores one chunk per question block and strategy
+    bullet with symptom metadata, so this is an exact metadata lookup with
+    no embedding. Collections built without that metadata return None.
+    """
+    if collection is None or symptom_index is None:
+        return None
+    try:
+        with span('chroma.get', purpose=kind):
+            results = collection.get(where={'$and': [{'kind': kind}, {'symptom_index': symptom_index}]},
+                                     include=['documents'])
+    except Exception:
+        return None
+    return results['documents'][0] if results.get('documents') else None
+
+def retrieve_question_text(collection, embedding_backend, question_topic, protocol_index=None, symptom_index=None):
+    """Look up the conversational wording of a GAD-7 question
+    
+    Uses the precompiled protocol index when available, then the question
+    chunk tagged with the symptom, then the lexical index (exact phrase, then
+    BM25), and otherwise falls back to a hybrid search and a scan of the
+    returned chunk.
+    """
+    question_text = f"Over the last couple of weeks, how often have you been {question_topic}?"
+    
+    if protocol_index and symptom_index is not None:
+        return protocol_index[symptom_index]['question']
+    
+    question_chunk = find_symptom_chunk(collection, 'question', symptom_index)
+    if question_chunk:
+        return extract_quoted_text(question_chunk.split('\n')[0]) or question_text
+    
+    lexical_index = get_lexical_index()
+    if lexical_index:
+        line_indexes = find_question_lines(lexical_index, question_topic, 1)
+        if line_indexes:
+            return extract_quoted_text(lexical_index.line_text(line_indexes[0])) or question_text
+    
+    # Search the knowledge base (hybrid when the lexical index is available) for the question
+    try:
+        question_results = search_knowledge_base(collection, embedding_backend, f"Question {question_topic}", 1,
+                                                 mode='hybrid', purpose='question')
+        
+        # Extract the question from results
+        if question_results and question_results['documents'] and question_results['documents'][0]:
+            # Search for the actual question in the document
+            doc_content = question_results['documents'][0][0]
+            lines = doc_content.split('\n')
+            
+            # Try to find the actual question in the document
+            for line in lines:
+                if f"Question:" in line and question_topic.split()[0] in line:
+                    # Extract the question text
+                    question_start = line.find('"') + 1
+                    question_end = line.rfind('"')
+                    if question_start > 0 and question_end > question_start:
+                        question_text = line[question_start:question_end]
+                    break
+            
+    except Exception as e:
+        print(f"⚠️  Error retrieving question: {e}")
+    
+    return question_text
+
+def retrieve_empathetic_response(collection, embedding_backend, question_topic, protocol_index=None, symptom_index=None):
+    """Look up the empathetic response shown after a high (2 or 3) score"""
+    fallback_text = "I can hear that this has been challenging for you. Thank you for sharing."
+    
+    if protocol_index and symptom_index is not None:
+        return protocol_index[symptom_index]['empathetic_response']
+    
+    # The response is part of its question's chunk
+    question_chunk = find_symptom_chunk(collection, 'question', symptom_index)
+    if question_chunk:
+        for line in question_chunk.split('\n'):
+            if "Empathetic Response" in line:
+                return extract_quoted_text(line) or fallback_text
+    
+    # The empathetic response is the line after its question; collections built without
+    # symptom metadata may have split the block, so find the question line in the full text
+    lexical_index = get_lexical_index()
+    if lexical_index:
+        for line_index in find_question_lines(lexical_index, question_topic):
+            response_index = lexical_index.following_line(line_index, "Empathetic Response")
+            if response_index is not None:
+                return extract_quoted_text(lexical_index.line_text(response_index)) or fallback_text
+    
+    try:
+        empathy_results = search_knowledge_base(collection, embedding_backend,
+                                                f"Empathetic Response {question_topic} scores 2 or 3", 1,
+                                                mode='hybrid', purpose='empathy')
+        
+        if empathy_results and empathy_results['documents'] and empathy_results['documents'][0]:
+            doc_content = empathy_results['documents'][0][0]
+            lines = doc_content.split('\n')
+            
+            # Find the empathetic response
+            for line in lines:
+                if "Empathetic Response" in line and "scores 2 or 3" in line:
+                    # Extract the empathetic response
+                    response_start = line.find('"') + 1
+                    response_end = line.rfind('"')
+                    if response_start > 0 and response_end > response_start:
+                        return line[response_start:response_end]
+            
+    except Exception as e:
+        print(f"⚠️  Error retrieving empathetic response: {e}")
+    
+    return fallback_text
+
+def interpret_gad7_score(total_score):
+    """Return (severity, emoji) for a total GAD-7 score"""
+    if total_score <= 4:
+        return "Minimal", "😊"
+    elif total_score <= 9:
+        return "Mild", "😐"
+    elif total_score <= 14:
+        return "Moderate", "😟"
+    else:
+        return "Severe", "😰"
+
+def print_stage2_intro():
+    """Print the stage 2 introduction"""
     print("\n" + "=" * 60)
     print("🧠 Stage 2: Anxiety Assessment (GAD-7)")
     print("=" * 60)
@@ -210,69 +680,61 @@ def stage2_gad7_assessment(collection, openai_client):
     print("\nPlease answer honestly - there are no right or wrong answers.")
     print("Your responses will help me offer you the most relevant coping strategies.")
     print("-" * 60)
+
+def print_assessment_summary(total_score):
+    """Print the stage 2 severity interpretation for a total GAD-7 score"""
+    # Assessment complete
+    print(f"\n" + "=" * 60)
+    print("📊 Assessment Complete")
+    print("=" * 60)
     
-    # GAD-7 questions search terms
-    gad7_questions = [
-        "feeling nervous, anxious, or on edge",
-        "being able to stop or control your worrying",
-        "worrying too much about different things",
-        "trouble relaxing",
-        "feeling so restless that it's hard to sit still",
-        "becoming easily annoyed or irritable",
-        "feeling afraid, as if something awful might happen"
-    ]
+    # Interpret total score
+    severity, emoji = interpret_gad7_score(total_score)
+    
+    print(f"Your anxiety level appears to be: {emoji} {severity}")
+    print(f"Total score: {total_score} out of 21")
+    
+    if total_score >= 10:
+        print("\n💡 Based on your responses, you might benefit from professional support.")
+        print("Consider reaching out to a mental health professional for personalized guidance.")
+    
+    # Where the scores came from is for traces, not for the user
+    stats = scoring_stats.summary()
+    current_span().set(scored_locally=stats['local_hits'], scored_from_cache=stats['cache_hits'],
+                       scored_by_llm=stats['llm_fallbacks'])
+    
+    print("\n✨ Remember: This assessment helps me provide you with more targeted support.")
+    print("Let's now explore some coping strategies that might help you feel better.")
+
+def stage2_gad7_assessment(collection, openai_client, embedding_backend, protocol_index=None, score_at_end=False):
+    """Stage 2: GAD-7 Assessment - Conduct anxiety screening
+    
+    With score_at_end=True all seven answers are collected first and scored
+    together in one batched request, and empathetic responses follow.
+    """
+    print_stage2_intro()
+    
+    if score_at_end:
+        return stage2_answer_all_then_score(collection, openai_client, embedding_backend, protocol_index)
     
     scores = []
     total_score = 0
     
-    for i, question_topic in enumerate(gad7_questions, 1):
+    for i, question_topic in enumerate(GAD7_QUESTION_TOPICS, 1):
         print(f"\n📋 Question {i} of 7:")
         print("-" * 30)
         
-        # Query ChromaDB for the specific question
-        try:
-            question_results = collection.query(
-                query_texts=[f"Question {question_topic}"],
-                n_results=1
-            )
-            
-            # Extract the question from results
-            if question_results['documents'] and question_results['documents'][0]:
-                # Search for the actual question in the document
-                doc_content = question_results['documents'][0][0]
-                lines = doc_content.split('\n')
-                
-                question_text = f"Over the last couple of weeks, how often have you been {question_topic}?"
-                
-                # Try to find the actual question in the document
-                for line in lines:
-                    if f"Question:" in line and question_topic.split()[0] in line:
-                        # Extract the question text
-                        question_start = line.find('"') + 1
-                        question_end = line.rfind('"')
-                        if question_start > 0 and question_end > question_start:
-                            question_text = line[question_start:question_end]
-                        break
-                
-                print(f"💭 {question_text}")
-                
-            else:
-                # Fallback question format
-                question_text = f"Over the last couple of weeks, how often have you been {question_topic}?"
-                print(f"💭 {question_text}")
-                
-        except Exception as e:
-            print(f"⚠️  Error retrieving question: {e}")
-            question_text = f"Over the last couple of weeks, how often have you been {question_topic}?"
-            print(f"💭 {question_text}")
+        question_text = retrieve_question_text(collection, embedding_backend, question_topic, protocol_index, i - 1)
+        print(f"💭 {question_text}")
         
         # Get user's answer
-        user_answer = input("\n🗣️  Your answer: ").strip()
+        with span('user.input', stage='gad7', question=i):
+            user_answer = input("\n🗣️  Your answer: ").strip()
         
         if not user_answer:
             user_answer = "no response"
         
-        # Get GAD-7 score from OpenAI
+        # Get GAD-7 score (locally when the answer is clear, otherwise from OpenAI)
         print("🔍 Analyzing your response...")
         score = get_gad7_score(openai_client, user_answer)
         scores.append(score)
@@ -280,68 +742,39 @@ def stage2_gad7_assessment(collection, openai_client):
         
         # If score is high (2 or 3), show empathetic response
         if score >= 2:
-            try:
-                empathy_results = collection.query(
-                    query_texts=[f"Empathetic Response {question_topic} scores 2 or 3"],
-                    n_results=1
-                )
-                
-                if empathy_results['documents'] and empathy_results['documents'][0]:
-                    doc_content = empathy_results['documents'][0][0]
-                    lines = doc_content.split('\n')
-                    
-                    # Find the empathetic response
-                    for line in lines:
-                        if "Empathetic Response" in line and "scores 2 or 3" in line:
-                            # Extract the empathetic response
-                            response_start = line.find('"') + 1
-                            response_end = line.rfind('"')
-                            if response_start > 0 and response_end > response_start:
-                                empathy_text = line[response_start:response_end]
-                                print(f"\n💙 {empathy_text}")
-                                break
-                    else:
-                        # Fallback empathetic response
-                        print(f"\n💙 I can hear that this has been challenging for you. Thank you for sharing.")
-                else:
-                    print(f"\n💙 I can hear that this has been challenging for you. Thank you for sharing.")
-                    
-            except Exception as e:
-                print(f"⚠️  Error retrieving empathetic response: {e}")
-                print(f"\n💙 I can hear that this has been challenging for you. Thank you for sharing.")
+            empathy_text = retrieve_empathetic_response(collection, embedding_backend, question_topic, protocol_index, i - 1)
+            print(f"\n💙 {empathy_text}")
         
         # Brief pause between questions
         if i < 7:
             print("\n" + "." * 20)
     
-    # Assessment complete
-    print(f"\n" + "=" * 60)
-    print("📊 Assessment Complete")
-    print("=" * 60)
+    print_assessment_summary(total_score)
     
-    # Interpret total score
-    if total_score <= 4:
-        severity = "Minimal"
-        emoji = "😊"
-    elif total_score <= 9:
-        severity = "Mild"
-        emoji = "😐"
-    elif total_score <= 14:
-        severity = "Moderate"
-        emoji = "😟"
-    else:
-        severity = "Severe"
-        emoji = "😰"
+    return scores, total_score
+
+def stage2_answer_all_then_score(collection, openai_client, embedding_backend, protocol_index=None):
+    """Ask all GAD-7 questions, then score every answer with get_gad7_scores"""
+    answers = []
+    for i, question_topic in enumerate(GAD7_QUESTION_TOPICS, 1):
+        print(f"\n📋 Question {i} of 7:")
+        print("-" * 30)
+        print(f"💭 {retrieve_question_text(collection, embedding_backend, question_topic, protocol_index, i - 1)}")
+        
+        with span('user.input', stage='gad7', question=i):
+            user_answer = input("\n🗣️  Your answer: ").strip()
+        answers.append(user_answer or "no response")
     
-    print(f"Your anxiety level appears to be: {emoji} {severity}")
-    print(f"Total score: {total_score} out of 21")
+    print("\n🔍 Analyzing your responses...")
+    scores = get_gad7_scores(openai_client, answers)
+    total_score = sum(scores)
     
-    if total_score >= 10:
-        print("\n💡 Based on your responses, you might benefit from professional support.")
-        print("Consider reaching out to a mental health professional for personalized guidance.")
+    for i, (question_topic, score) in enumerate(zip(GAD7_QUESTION_TOPICS, scores), 1):
+        if score >= 2:
+            empathy_text = retrieve_empathetic_response(collection, embedding_backend, question_topic, protocol_index, i - 1)
+            print(f"\n💙 (About question {i}) {empathy_text}")
     
-    print("\n✨ Remember: This assessment helps me provide you with more targeted support.")
-    print("Let's now explore some coping strategies that might help you feel better.")
+    print_assessment_summary(total_score)
     
     return scores, total_score
 
@@ -364,29 +797,36 @@ def get_highest_scoring_symptom(scores):
     
     return highest_symptom, max_score
 
-def stage3_personalized_response(collection, openai_client, journal_entry, gad7_scores, total_gad7_score):
-    """Stage 3: Generate personalized response with CBT strategies"""
-    print("\n" + "=" * 60)
-    print("🎯 Stage 3: Personalized Mental Health Support")
-    print("=" * 60)
-    print("Creating your personalized mental health summary and recommendations...")
+def retrieve_cbt_strategy(collection, embedding_backend, highest_symptom, protocol_index=None, symptom_index=None):
+    """Look up the CBT strategy line for a symptom
     
-    # Get highest-scoring symptom
-    highest_symptom, highest_score = get_highest_scoring_symptom(gad7_scores)
+    Uses the precompiled protocol index when available, then the strategy
+    chunk tagged with the symptom, then the lexical index (exact phrase, then
+    BM25), and otherwise falls back to a hybrid search and a scan of the
+    returned chunk.
+    """
+    if protocol_index and symptom_index is not None:
+        return protocol_index[symptom_index]['strategy']
     
-    print(f"🔍 Analyzing your responses...")
-    print(f"📊 Your highest concern appears to be: {highest_symptom} (score: {highest_score})")
+    strategy_chunk = find_symptom_chunk(collection, 'strategy', symptom_index)
+    if strategy_chunk:
+        return strategy_chunk.split('\n')[0].strip()
+    
+    lexical_index = get_lexical_index()
+    if lexical_index:
+        with span('lexical.search', purpose='strategy'):
+            exact = lexical_index.find_phrase(f"Strategy for {highest_symptom}")
+            line_index = exact[0] if exact else lexical_index.best_line(highest_symptom, require="Strategy for")
+        if line_index is not None:
+            return lexical_index.line_text(line_index)
     
     # Query ChromaDB for the most relevant CBT tip for highest-scoring symptom
-    print("🔍 Searching for targeted coping strategies...")
     try:
-        cbt_results = collection.query(
-            query_texts=[f"Strategy for {highest_symptom}"],
-            n_results=1
-        )
+        cbt_results = search_knowledge_base(collection, embedding_backend, f"Strategy for {highest_symptom}", 1,
+                                            mode='hybrid', purpose='strategy')
         
         relevant_cbt_tip = ""
-        if cbt_results['documents'] and cbt_results['documents'][0]:
+        if cbt_results and cbt_results['documents'] and cbt_results['documents'][0]:
             doc_content = cbt_results['documents'][0][0]
             lines = doc_content.split('\n')
             
@@ -410,17 +850,19 @@ def stage3_personalized_response(collection, openai_client, journal_entry, gad7_
                         relevant_cbt_tip = line.strip()
                         break
         
-        if not relevant_cbt_tip:
-            relevant_cbt_tip = "- **General Strategy:** When feeling overwhelmed, try the 5-4-3-2-1 grounding technique. Name 5 things you can see, 4 you can touch, 3 you can hear, 2 you can smell, and 1 you can taste."
+        if relevant_cbt_tip:
+            return relevant_cbt_tip
             
     except Exception as e:
         print(f"⚠️  Error retrieving CBT strategy: {e}")
-        relevant_cbt_tip = "- **General Strategy:** When feeling overwhelmed, try the 5-4-3-2-1 grounding technique. Name 5 things you can see, 4 you can touch, 3 you can hear, 2 you can smell, and 1 you can taste."
-    
-    print("🤖 Generating your personalized response...")
     
-    # Create the complex prompt as specified
-    final_prompt = f"""You are an empathetic mental health assistant. Based on the user's journal entry, their GAD-7 score, and their most difficult symptom, write a brief, supportive summary. Then, retrieve the single most relevant coping strategy from the knowledge base for their highest-scoring symptom and present it to them.
+    return GENERAL_CBT_STRATEGY
+
+STAGE3_SYSTEM_PROMPT = "You are a compassionate mental health support assistant. Be warm, empathetic, and supportive while providing practical guidance."
+
+def build_stage3_prompt(journal_entry, total_gad7_score, highest_symptom, highest_score, relevant_cbt_tip):
+    """Build the stage 3 prompt from the journal entry, scores and CBT strategy"""
+    return f"""You are an empathetic mental health assistant. Based on the user's journal entry, their GAD-7 score, and their most difficult symptom, write a brief, supportive summary. Then, retrieve the single most relevant coping strategy from the knowledge base for their highest-scoring symptom and present it to them.
 
 User's Journal Entry:
 {journal_entry}
@@ -440,34 +882,119 @@ Please provide a warm, supportive response that:
 
 Keep your response compassionate, personal, and around 150-200 words."""
 
+def build_fallback_summary(highest_symptom, relevant_cbt_tip):
+    """Summary shown when the personalized response can't be generated"""
+    return "\n".join([
+        "Thank you for sharing your thoughts and taking the time for this assessment. ",
+        f"Your concerns about {highest_symptom} are valid and manageable. ",
+        f"Here's a strategy that might help: {relevant_cbt_tip}",
+        "Remember, you're taking positive steps by being mindful of your mental health."
+    ])
+
+def generate_personalized_summary(openai_client, journal_entry, gad7_scores, total_gad7_score, relevant_cbt_tip,
+                                  raise_errors=False):
+    """Return the stage 3 summary text without printing, using the fallback text on errors
+    
+    With raise_errors, API errors are raised instead of replaced by the fallback.
+    """
+    highest_symptom, highest_score = get_highest_scoring_symptom(gad7_scores)
+    final_prompt = build_stage3_prompt(journal_entry, total_gad7_score, highest_symptom, highest_score, relevant_cbt_tip)
+    
     try:
         response = openai_client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
-                {"role": "system", "content": "You are a compassionate mental health support assistant. Be warm, empathetic, and supportive while providing practical guidance."},
+                {"role": "system", "content": STAGE3_SYSTEM_PROMPT},
                 {"role": "user", "content": final_prompt}
             ],
             max_tokens=250,
             temperature=0.7
         )
-        
-        ai_response = response.choices[0].message.content
-        
-        # Display the personalized response
-        print("\n" + "=" * 60)
-        print("💝 Your Personalized Mental Health Summary")
-        print("=" * 60)
-        print(ai_response)
+        return response.choices[0].message.content
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"⚠️  Error generating personalized response: {e}")
+        return build_fallback_summary(highest_symptom, relevant_cbt_tip)
+
+def stage3_personalized_response(collection, openai_client, embedding_backend, journal_entry, gad7_scores, total_gad7_score, protocol_index=None, relevant_cbt_tip=None, stream=True):
+    """Stage 3: Generate personalized response with CBT strategies
+    
+    relevant_cbt_tip may be passed in when it was already looked up ahead of
+    time. With stream=True the response is printed token by token; if the
+    stream breaks part-way the usual fallback summary is printed after it.
+    """
+    print("\n" + "=" * 60)
+    print("🎯 Stage 3: Personalized Mental Health Support")
+    print("=" * 60)
+    print("Creating your personalized mental health summary and recommendations...")
+    
+    # Get highest-scoring symptom
+    highest_symptom, highest_score = get_highest_scoring_symptom(gad7_scores)
+    
+    print(f"🔍 Analyzing your responses...")
+    print(f"📊 Your highest concern appears to be: {highest_symptom} (score: {highest_score})")
+    
+    # Look up the most relevant CBT tip for highest-scoring symptom
+    if relevant_cbt_tip is None:
+        print("🔍 Searching for targeted coping strategies...")
+        relevant_cbt_tip = retrieve_cbt_strategy(collection, embedding_backend, highest_symptom, protocol_index,
+                                                 gad7_scores.index(highest_score))
+    
+    print("🤖 Generating your personalized response...")
+    
+    # Create the complex prompt as specified
+    final_prompt = build_stage3_prompt(journal_entry, total_gad7_score, highest_symptom, highest_score, relevant_cbt_tip)
+
+    messages = [
+        {"role": "system", "content": STAGE3_SYSTEM_PROMPT},
+        {"role": "user", "content": final_prompt}
+    ]
+    
+    header_printed = False
+    try:
+        if stream:
+            # Print the header up front so tokens appear under it as they arrive
+            print("\n" + "=" * 60)
+            print("💝 Your Personalized Mental Health Summary")
+            print("=" * 60)
+            header_printed = True
+            
+            ai_response, _ = stream_chat_completion(
+                openai_client,
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=250,
+                temperature=0.7,
+                on_token=lambda token: print(token, end="", flush=True)
+            )
+            # Timings are recorded on the stream's span, not shown to the user
+            print()
+        else:
+            response = openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                max_tokens=250,
+                temperature=0.7
+            )
+            
+            ai_response = response.choices[0].message.content
+            
+            # Display the personalized response
+            print("\n" + "=" * 60)
+            print("💝 Your Personalized Mental Health Summary")
+            print("=" * 60)
+            print(ai_response)
         
     except Exception as e:
+        if header_printed:
+            print()
         print(f"⚠️  Error generating personalized response: {e}")
-        print("\n" + "=" * 60)
-        print("💝 Your Personalized Mental Health Summary")
-        print("=" * 60)
-        print(f"Thank you for sharing your thoughts and taking the time for this assessment. ")
-        print(f"Your concerns about {highest_symptom} are valid and manageable. ")
-        print(f"Here's a strategy that might help: {relevant_cbt_tip}")
-        print("Remember, you're taking positive steps by being mindful of your mental health.")
+        if not header_printed:
+            print("\n" + "=" * 60)
+            print("💝 Your Personalized Mental Health Summary")
+            print("=" * 60)
+        print(build_fallback_summary(highest_symptom, relevant_cbt_tip))
     
     # Supportive closing message
     print("\n" + "=" * 60)
@@ -481,35 +1008,118 @@ Keep your response compassionate, personal, and around 150-200 words."""
     print("\n💙 Take care of yourself. You matter, and your wellbeing is important.")
     print("=" * 60)
 
-def main():
-    """Main function to run the mental health chatbot"""
+def check_vector_store():
+    """Exit early if the database (or snapshot) VECTOR_BACKEND needs hasn't been built
     
-    # Setup and initialization
-    print("=" * 60)
-    print("🧠 Mental Health Check-in Chatbot")
-    print("=" * 60)
+    Only checks that the files exist, without importing chromadb, so it can
+    run before the check-in starts; the initializers still validate them.
+    """
+    if VECTOR_BACKEND == 'snapshot':
+        from vector_snapshot import VECTOR_SNAPSHOT_PATH
+        if not os.path.isfile(VECTOR_SNAPSHOT_PATH):
+            print(f"❌ Error: Vector snapshot {VECTOR_SNAPSHOT_PATH} not found")
+            print("Please run 'python build_database.py' first to export the snapshot")
+            sys.exit(1)
+    elif not os.path.isfile(os.path.join(CHROMA_PATH, "chroma.sqlite3")):
+        print(f"❌ Error: No ChromaDB database found in {CHROMA_PATH}")
+        print("Please run 'python build_database.py' first to create the vector database")
+        sys.exit(1)
+
+def load_resources(api_key, log=print):
+    """Setup steps 2-4; returns (collection, openai_client, embedding_backend, protocol_index)"""
+    # Step 2: Initialize OpenAI client and the shared embedding backend
+    openai_client = initialize_openai_client(api_key, log)
+    embedding_backend = OpenAIEmbeddingBackend(openai_client)
+    
+    # Step 3: Initialize ChromaDB (or the snapshot backend) and get collection
+    if VECTOR_BACKEND == 'snapshot':
+        collection = initialize_vector_snapshot(embedding_backend, log)
+    else:
+        collection = initialize_chromadb(embedding_backend, log)
+    
+    # Step 4: Load the precompiled protocol index for direct lookups
+    protocol_index = load_protocol_index()
+    if protocol_index:
+        log("✓ Loaded precompiled protocol index")
+    else:
+        log("⚠️  Protocol index not found; falling back to vector search for questions and strategies")
     
+    return collection, openai_client, embedding_backend, protocol_index
+
+def initialize_resources():
+    """Run setup steps and return (collection, openai_client, embedding_backend, protocol_index)"""
     # Step 1: Setup environment
     api_key = setup_environment()
+    return load_resources(api_key)
+
+def main(use_async=False, score_at_end=False):
+    """Main function to run the mental health chatbot
     
-    # Step 2: Initialize ChromaDB and get collection
-    collection = initialize_chromadb()
-    
-    # Step 3: Initialize OpenAI client
-    openai_client = initialize_openai_client(api_key)
+    With use_async=True the check-in runs through the asyncio pipeline in
+    async_checkin.py, which prefetches retrieval and scores in the background.
+    With score_at_end=True all GAD-7 answers are scored in one batched request.
+    """
     
-    print("\n" + "=" * 60)
-    print("🌟 Setup Complete!")
+    # Setup and initialization
+    print("=" * 60)
+    print("🧠 Mental Health Check-in Chatbot")
     print("=" * 60)
     
-    # Stage 1: Journaling
-    journal_entry = stage1_journaling()
+    if use_async:
+        collection, openai_client, embedding_backend, protocol_index = initialize_resources()
+        
+        print("\n" + "=" * 60)
+        print("🌟 Setup Complete!")
+        print("=" * 60)
+        
+        import asyncio
+        from async_checkin import run_checkin_async
+        with span('checkin', mode='async'):
+            asyncio.run(run_checkin_async(collection, openai_client, embedding_backend, protocol_index))
+        return
     
-    # Stage 2: GAD-7 Assessment
-    gad7_scores, total_gad7_score = stage2_gad7_assessment(collection, openai_client)
+    api_key = setup_environment()
+    # Fail before journaling rather than after it if the database hasn't been built
+    check_vector_store()
     
-    # Stage 3: Personalized Response with CBT Strategies
-    stage3_personalized_response(collection, openai_client, journal_entry, gad7_scores, total_gad7_score)
+    with span('checkin', mode='sync'):
+        # Stage 1: Journaling, while ChromaDB and the OpenAI client load in the background.
+        # Their progress and error messages are held back so they don't interleave with the prompts.
+        setup_messages = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            resources_future = executor.submit(load_resources, api_key, setup_messages.append)
+            with span('stage1_journaling'):
+                journal_entry = stage1_journaling()
+            try:
+                collection, openai_client, embedding_backend, protocol_index = resources_future.result()
+            finally:
+                # Shown once loading is done, including the reason if it failed
+                for message in setup_messages:
+                    print(message)
+        
+        print("\n" + "=" * 60)
+        print("🌟 Setup Complete!")
+        print("=" * 60)
+        
+        # Stage 2: GAD-7 Assessment
+        with span('stage2_gad7_assessment'):
+            gad7_scores, total_gad7_score = stage2_gad7_assessment(collection, openai_client, embedding_backend,
+                                                                   protocol_index, score_at_end)
+        
+        # Stage 3: Personalized Response with CBT Strategies
+        with span('stage3_personalized_response'):
+            stage3_personalized_response(collection, openai_client, embedding_backend, journal_entry, gad7_scores,
+                                         total_gad7_score, protocol_index)
+
+def parse_args():
+    """Parse command-line options for the chatbot"""
+    parser = argparse.ArgumentParser(description="Mental Health Check-in Chatbot")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="prefetch retrieval and score answers in the background between questions")
+    parser.add_argument("--score-at-end", action="store_true",
+                        help="answer all seven questions first, then score them together in one request")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    args = parse_args()
+    main(use_async=args.use_async, score_at_end=args.score_at_end)
@@ -0,0 +1,145 @@
+"""
+Async Check-in Pipeline
+An asyncio version of the stage 1-3 check-in flow in app.py that hides
+network latency behind the user's typing:
+
+- the first question and its empathetic response are fetched while the user journals,
+- each next question is fetched while the current one is being answered,
+- answers are scored in the background while the next question is shown,
+- the stage 3 CBT lookup starts while questions are still being answered:
+  each time a score arrives, the strategy for the symptom leading so far is
+  fetched, so the final one is usually ready when the assessment ends.
+
+Blocking calls (input(), OpenAI, ChromaDB) run in worker threads via
+asyncio.to_thread, so the same synchronous helpers from app.py are reused.
+to_thread copies the current context, so tracing spans opened in worker
+threads nest under the stage that started them.
+"""
+
+import asyncio
+
+from app import (GAD7_QUESTION_TOPICS, get_gad7_score, get_highest_scoring_symptom, print_assessment_summary,
+                 print_stage2_intro, retrieve_cbt_strategy, retrieve_empathetic_response, retrieve_question_text,
+                 stage1_journaling, stage3_personalized_response)
+from tracing import span
+
+# How long to wait for a score before showing the next question. Local and
+# cached scores finish well within this, so their empathetic responses still
+# appear in order; slow LLM scores keep running in the background.
+SCORE_GRACE_PERIOD_SECONDS = 0.3
+
+def prefetch_leading_strategy(collection, embedding_backend, protocol_index, scores, strategy_tasks):
+    """Start the CBT lookup for the symptom leading scores (None for unscored answers)
+
+    Each symptom is looked up at most once; tasks are kept in strategy_tasks
+    by symptom index. Returns the leading symptom's index.
+    """
+    known_scores = [-1 if score is None else score for score in scores]
+    highest_symptom, highest_score = get_highest_scoring_symptom(known_scores)
+    symptom_index = known_scores.index(highest_score)
+    if symptom_index not in strategy_tasks:
+        strategy_tasks[symptom_index] = asyncio.create_task(asyncio.to_thread(
+            retrieve_cbt_strategy, collection, embedding_backend, highest_symptom, protocol_index, symptom_index
+        ))
+    return symptom_index
+
+def prefetch_protocol_item(collection, embedding_backend, protocol_index, symptom_index):
+    """Start looking up a question and its empathetic response; returns (question_task, empathy_task)"""
+    question_topic = GAD7_QUESTION_TOPICS[symptom_index]
+    question_task = asyncio.create_task(asyncio.to_thread(
+        retrieve_question_text, collection, embedding_backend, question_topic, protocol_index, symptom_index
+    ))
+    empathy_task = asyncio.create_task(asyncio.to_thread(
+        retrieve_empathetic_response, collection, embedding_backend, question_topic, protocol_index, symptom_index
+    ))
+    return question_task, empathy_task
+
+async def stage2_gad7_assessment_async(collection, openai_client, embedding_backend, protocol_index=None,
+                                       first_prefetch=None, strategy_tasks=None):
+    """Stage 2 with look-ahead retrieval and background scoring; returns (scores, total_score)
+
+    If strategy_tasks (a dict) is given, CBT strategy lookups for the leading
+    symptom are started in it as scores arrive.
+    """
+    print_stage2_intro()
+
+    current_question = 0
+    known_scores = [None] * len(GAD7_QUESTION_TOPICS)
+
+    async def score_answer(question_number, user_answer, empathy_task):
+        score = await asyncio.to_thread(get_gad7_score, openai_client, user_answer)
+        known_scores[question_number - 1] = score
+        if strategy_tasks is not None:
+            prefetch_leading_strategy(collection, embedding_backend, protocol_index, known_scores, strategy_tasks)
+        if score >= 2:
+            empathy_text = await empathy_task
+            if current_question != question_number:
+                # The user has already moved on; say which answer this is about
+                print(f"\n💙 (About question {question_number}) {empathy_text}")
+            else:
+                print(f"\n💙 {empathy_text}")
+        return score
+
+    prefetch = first_prefetch or prefetch_protocol_item(collection, embedding_backend, protocol_index, 0)
+    score_tasks = []
+
+    for i in range(1, len(GAD7_QUESTION_TOPICS) + 1):
+        question_task, empathy_task = prefetch
+        current_question = i
+
+        # Look ahead: fetch the next question while this one is answered
+        if i < len(GAD7_QUESTION_TOPICS):
+            prefetch = prefetch_protocol_item(collection, embedding_backend, protocol_index, i)
+
+        print(f"\n📋 Question {i} of 7:")
+        print("-" * 30)
+        print(f"💭 {await question_task}")
+
+        with span('user.input', stage='gad7', question=i):
+            user_answer = (await asyncio.to_thread(input, "\n🗣️  Your answer: ")).strip()
+        if not user_answer:
+            user_answer = "no response"
+
+        score_task = asyncio.create_task(score_answer(i, user_answer, empathy_task))
+        score_tasks.append(score_task)
+        await asyncio.wait([score_task], timeout=SCORE_GRACE_PERIOD_SECONDS)
+
+        # Brief pause between questions
+        if i < 7:
+            print("\n" + "." * 20)
+
+    current_question = None
+    scores = list(await asyncio.gather(*score_tasks))
+    return scores, sum(scores)
+
+async def run_checkin_async(collection, openai_client, embedding_backend, protocol_index=None):
+    """Run stages 1-3 with prefetching and background scoring"""
+    # Stage 1: Journaling, while the first question is fetched
+    first_prefetch = prefetch_protocol_item(collection, embedding_backend, protocol_index, 0)
+    with span('stage1_journaling'):
+        journal_entry = await asyncio.to_thread(stage1_journaling)
+
+    # Stage 2: GAD-7 Assessment, prefetching the CBT strategy for the leading symptom as scores arrive
+    strategy_tasks = {}
+    with span('stage2_gad7_assessment'):
+        gad7_scores, total_gad7_score = await stage2_gad7_assessment_async(
+            collection, openai_client, embedding_backend, protocol_index, first_prefetch, strategy_tasks
+        )
+
+    # Usually started when the last score arrived; this only picks the final leader's task
+    symptom_index = prefetch_leading_strategy(collection, embedding_backend, protocol_index, gad7_scores,
+                                              strategy_tasks)
+    # Leaders that were overtaken aren't needed any more
+    for index, task in strategy_tasks.items():
+        if index != symptom_index:
+            task.cancel()
+
+    print_assessment_summary(total_gad7_score)
+
+    # Stage 3: Personalized Response with CBT Strategies
+    relevant_cbt_tip = await strategy_tasks[symptom_index]
+    with span('stage3_personalized_response'):
+        await asyncio.to_thread(
+            stage3_personalized_response, collection, openai_client, embedding_backend, journal_entry,
+            gad7_scores, total_gad7_score, protocol_index, relevant_cbt_tip
+        )
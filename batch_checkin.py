@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Batch Check-in
+Runs full check-ins non-interactively from a JSONL file, for bulk re-scoring
+and regression sweeps. Each input line is one session:
+
+    {"session_id": "abc", "journal": "This week was...", "answers": ["sometimes", ..., "not at all"]}
+
+session_id is optional (the record's position is used instead). Sessions
+run on a bounded worker pool. Each one's answers are scored together (one
+batched request covers any the local scorer can't handle), then the stage 3
+strategy lookup and summary from app.py run, and one result record per
+session is written to the output JSONL in input order:
+
+    {"index": 0, "session_id": "abc", "scores": [...], "total_score": 9, "severity": "Mild",
+     "highest_symptom": "...", "highest_score": 2, "strategy": "...", "summary": "...", "elapsed_seconds": 1.2}
+
+Sessions that can't be processed, including any whose scoring or summary
+request fails, get {"index", "session_id", "error"} instead.
+
+Input is read lazily and at most --max-in-flight sessions are held at once,
+so memory stays constant however large the file is. Because output is in
+input order, an interrupted run resumes by skipping as many input records as
+the output already holds (a partially written last line is discarded).
+
+Run with: python batch_checkin.py sessions.jsonl results.jsonl --workers 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app import (GAD7_QUESTION_TOPICS, generate_personalized_summary, get_gad7_scores, get_highest_scoring_symptom,
+                 initialize_resources, interpret_gad7_score, retrieve_cbt_strategy)
+from gad7_scoring import scoring_stats
+from tracing import span
+
+DEFAULT_WORKERS = 8
+PROGRESS_EVERY = 100
+
+def read_sessions(path, skip=0):
+    """Yield (index, session_or_error) for each non-blank input line, skipping the first skip records"""
+    with open(path, 'r', encoding='utf-8') as file:
+        index = 0
+        for line in file:
+            if not line.strip():
+                continue
+            if index >= skip:
+                try:
+                    yield index, json.loads(line)
+                except ValueError as e:
+                    yield index, ValueError(f"invalid JSON: {e}")
+            index += 1
+
+def prepare_output(path):
+    """Drop a partially written last line and return how many complete records the output holds"""
+    if not os.path.exists(path):
+        return 0
+
+    completed = 0
+    last_complete_end = 0
+    with open(path, 'rb') as file:
+        position = 0
+        for line in file:
+            position += len(line)
+            if line.endswith(b'\n'):
+                completed += 1
+                last_complete_end = position
+
+    if last_complete_end != os.path.getsize(path):
+        with open(path, 'r+b') as file:
+            file.truncate(last_complete_end)
+    return completed
+
+def validate_session(session):
+    """Return (session_id, journal_entry, answers) or raise ValueError"""
+    if isinstance(session, Exception):
+        raise session
+    if not isinstance(session, dict):
+        raise ValueError("session must be a JSON object")
+
+    answers = session.get('answers')
+    if not isinstance(answers, list) or len(answers) != len(GAD7_QUESTION_TOPICS):
+        raise ValueError(f"answers must be a list of {len(GAD7_QUESTION_TOPICS)} strings")
+    answers = [str(answer).strip() or "no response" for answer in answers]
+    journal_entry = str(session.get('journal') or '').strip() or "User chose not to write much today."
+    return session.get('session_id'), journal_entry, answers
+
+def run_session(resources, index, session, with_summary=True):
+    """Score one session and build its summary; returns the output record"""
+    collection, openai_client, embedding_backend, protocol_index = resources
+    start_time = time.perf_counter()
+    session_id = session.get('session_id') if isinstance(session, dict) else None
+
+    try:
+        session_id, journal_entry, answers = validate_session(session)
+    except ValueError as e:
+        return {'index': index, 'session_id': session_id, 'error': str(e)}
+
+    with span('batch.session', index=index):
+        try:
+            # Failed API calls become error records rather than 0 scores or fallback summaries
+            scores = get_gad7_scores(openai_client, answers, raise_errors=True)
+            total_score = sum(scores)
+            severity, _ = interpret_gad7_score(total_score)
+            highest_symptom, highest_score = get_highest_scoring_symptom(scores)
+            strategy = retrieve_cbt_strategy(collection, embedding_backend, highest_symptom, protocol_index,
+                                             scores.index(highest_score))
+            summary = (generate_personalized_summary(openai_client, journal_entry, scores, total_score, strategy,
+                                                     raise_errors=True)
+                       if with_summary else None)
+        except Exception as e:
+            return {'index': index, 'session_id': session_id, 'error': str(e)}
+
+    return {
+        'index': index,
+        'session_id': session_id,
+        'scores': scores,
+        'total_score': total_score,
+        'severity': severity,
+        'highest_symptom': highest_symptom,
+        'highest_score': highest_score,
+        'strategy': strategy,
+        'summary': summary,
+        'elapsed_seconds': round(time.perf_counter() - start_time, 3)
+    }
+
+def run_batch(input_path, output_path, workers=DEFAULT_WORKERS, max_in_flight=None, with_summary=True):
+    """Process every session in input_path, appending results to output_path; returns the number written"""
+    max_in_flight = max_in_flight or workers * 2
+    skip = prepare_output(output_path)
+    if skip:
+        print(f"↩️  Resuming: {skip} sessions already in {output_path}")
+
+    resources = initialize_resources()
+    written = 0
+    errors = 0
+    start_time = time.perf_counter()
+
+    with open(output_path, 'a', encoding='utf-8') as output, ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+
+        def write_next():
+            nonlocal written, errors
+            record = pending.popleft().result()
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+            written += 1
+            errors += 'error' in record
+            if written % PROGRESS_EVERY == 0:
+                rate = written / (time.perf_counter() - start_time)
+                print(f"   {skip + written} sessions done ({rate:.1f}/s, {errors} errors)")
+
+        for index, session in read_sessions(input_path, skip):
+            pending.append(executor.submit(run_session, resources, index, session, with_summary))
+            # Results are written in input order; the window bounds memory and in-flight work
+            while len(pending) >= max_in_flight:
+                write_next()
+        while pending:
+            write_next()
+
+    elapsed = time.perf_counter() - start_time
+    stats = scoring_stats.summary()
+    print(f"✅ Wrote {written} results to {output_path} in {elapsed:.1f}s ({errors} errors)")
+    print(f"⚡ {stats['local_hits'] + stats['cache_hits']} of {stats['total']} answers scored without the AI model")
+    return written
+
+def parse_args():
+    """Parse command-line options for batch mode"""
+    parser = argparse.ArgumentParser(description="Run check-ins from a JSONL file of sessions")
+    parser.add_argument("input", help="JSONL file with one session per line")
+    parser.add_argument("output", help="JSONL file results are appended to; existing results are resumed from")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="sessions processed concurrently")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="sessions read ahead of the output (default: 2 x workers)")
+    parser.add_argument("--no-summary", action="store_true",
+                        help="skip the stage 3 personalized summary (scoring and strategy only)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.path.exists(args.input):
+        print(f"❌ Input file not found: {args.input}")
+        sys.exit(1)
+    run_batch(args.input, args.output, args.workers, args.max_in_flight, not args.no_summary)
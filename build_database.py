@@ -1,6 +1,13 @@
+import argparse
+import contextvars
+import hashlib
+import importlib
+import json
 import subprocess
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 def install_package(package):
     """Install a package using pip"""
@@ -34,20 +41,25 @@ def check_and_install_dependencies():
     
     return True
 
-# Check and install dependencies
-if not check_and_install_dependencies():
-    print("Failed to install required dependencies. Exiting.")
-    sys.exit(1)
-
-# Import libraries after ensuring they're installed
-try:
-    import chromadb
-    import openai
-    from langchain_text_splitters import RecursiveCharacterTextSplitter
-    print("✓ All libraries imported successfully")
-except ImportError as e:
-    print(f"Import error: {e}")
-    sys.exit(1)
+def import_dependency(module_name):
+    """Import a third-party module on first use, exiting with a hint if it is missing
+    
+    Heavy libraries are imported lazily so that importing this module (or
+    running --help) stays fast.
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"Import error: {e}")
+        print("Run 'python build_database.py --check-deps' to install missing packages")
+        sys.exit(1)
+
+from embeddings import EmbeddingMismatchError, OpenAIEmbeddingBackend
+from ingestion import (CHUNK_OVERLAP, CHUNK_SIZE, DEFAULT_DOCUMENT_PATHS, iter_batches, iter_chunks, iter_document_files,
+                       is_protocol_document)
+from openai_transport import get_openai_client
+from lexical_index import LEXICAL_INDEX_PATH, LexicalIndexBuilder
+from protocol_index import PROTOCOL_INDEX_PATH, build_protocol_index, write_protocol_index
 
 def set_openai_api_key():
     """Set OpenAI API key from environment variable or .env file"""
@@ -70,70 +82,91 @@ def set_openai_api_key():
         print("2. Set it using: export OPENAI_API_KEY='your-api-key-here'")
         return None
     
-    openai.api_key = api_key
     print("✓ OpenAI API key set successfully")
     return api_key
 
-def load_documents():
-    """Load content from both GAD-7 protocol and CBT tips files"""
-    documents = {}
+# Chunks embedded and written to the collection per step of the streaming pipeline
+INGEST_BATCH_SIZE = 256
+BUILD_CHECKPOINT_PATH = './db/build_checkpoint.json'
+
+def find_documents(paths):
+    """List (doc_name, path) for every document file under paths"""
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"✗ File not found: {path}")
     
-    # File paths
-    files_to_load = {
-        'gad7_protocol': 'gad7_protocol.txt',
-        'cbt_tips': 'cbt_tips.txt'
-    }
+    document_files = []
+    seen_names = set()
+    for doc_name, path in iter_document_files(path for path in paths if os.path.exists(path)):
+        # Chunk ids are derived from the document name, so names must be unique
+        if doc_name in seen_names:
+            print(f"⚠️  Skipping {path}: another document is already named '{doc_name}'")
+            continue
+        seen_names.add(doc_name)
+        document_files.append((doc_name, path))
+    
+    print(f"✓ Found {len(document_files)} documents")
+    return document_files
+
+def load_protocol_documents(document_files):
+    """Load the GAD-7 protocol and CBT tips files the protocol index is compiled from
     
-    for doc_name, file_path in files_to_load.items():
+    These are read whole because the index parses them as a unit; all other
+    documents only pass through the streaming chunk pipeline.
+    """
+    documents = {}
+    
+    for doc_name, file_path in document_files:
+        name = doc_name.rsplit('/', 1)[-1]
+        if not is_protocol_document(doc_name) or name in documents:
+            continue
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 content = file.read()
-                documents[doc_name] = content
+                documents[name] = content
                 print(f"✓ Loaded {file_path} ({len(content)} characters)")
-        except FileNotFoundError:
-            print(f"✗ File not found: {file_path}")
         except Exception as e:
             print(f"✗ Error loading {file_path}: {e}")
     
     return documents
 
-def split_text_into_chunks(documents, chunk_size=1000, chunk_overlap=200):
-    """Split documents into smaller chunks using RecursiveCharacterTextSplitter"""
+def split_text_into_chunks(document_files, workers=None, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Stream structure-aware chunks of the documents, split on worker processes
     
-    # Initialize the text splitter
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        length_function=len,
-        separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
-    )
+    Each question block, strategy bullet or heading section becomes one
+    chunk; only blocks longer than chunk_size are split further with
+    RecursiveCharacterTextSplitter. Returns a generator; files are read and
+    split only as fast as chunks are consumed (see ingestion.py).
+    """
+    # Fail here with an install hint rather than inside a worker process
+    import_dependency('langchain_text_splitters')
+    return iter_chunks(document_files, workers=workers, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+class ChunkStream:
+    """Passes chunks through once, feeding the lexical index and counting them on the way
     
-    all_chunks = []
+    documents maps each document name to its number of chunks, which is all
+    sync_vector_database needs to find stale chunks afterwards.
+    """
     
-    for doc_name, content in documents.items():
-        if content:  # Only process if content exists
-            # Split the text into chunks
-            chunks = text_splitter.split_text(content)
-            
-            # Add metadata to each chunk
-            for i, chunk in enumerate(chunks):
-                chunk_data = {
-                    'content': chunk,
-                    'source': doc_name,
-                    'chunk_id': f"{doc_name}_chunk_{i+1}",
-                    'chunk_number': i + 1,
-                    'total_chunks': len(chunks)
-                }
-                all_chunks.append(chunk_data)
-            
-            print(f"✓ Split {doc_name} into {len(chunks)} chunks")
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.lexical_index = LexicalIndexBuilder()
+        self.documents = {}
+        self.total = 0
     
-    return all_chunks
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.lexical_index.add(chunk)
+            self.documents[chunk['source']] = chunk['chunk_number']
+            self.total += 1
+            yield chunk
 
 def initialize_chromadb():
     """Initialize persistent ChromaDB client"""
     try:
         # Create persistent client that saves to local 'db' directory
+        chromadb = import_dependency('chromadb')
         client = chromadb.PersistentClient(path="./db")
         print("✓ ChromaDB client initialized successfully")
         return client
@@ -141,47 +174,177 @@ def initialize_chromadb():
         print(f"✗ Error initializing ChromaDB: {e}")
         return None
 
-def get_openai_embeddings(texts, api_key):
-    """Generate embeddings using OpenAI's text-embedding-3-small model"""
-    if not api_key:
-        print("✗ OpenAI API key required for embeddings")
+def create_embedding_backend(api_key, **options):
+    """Create the embedding backend shared with app.py"""
+    return OpenAIEmbeddingBackend(get_openai_client(api_key), **options)
+
+def get_openai_embeddings(texts, embedding_backend):
+    """Generate embeddings for texts with the configured embedding backend
+    
+    Texts already in the shared embedding cache are not re-embedded; the rest
+    are sent in batched, concurrent requests, and a failed request is retried
+    one text at a time. The returned list is in the same order as texts, with
+    None for any text that still couldn't be embedded, or None if embedding
+    failed altogether.
+    """
+    if not embedding_backend:
+        print("✗ Embedding backend required for embeddings")
         return None
     
     try:
-        # Set up OpenAI client
-        client = openai.OpenAI(api_key=api_key)
-        
-        embeddings = []
-        total_texts = len(texts)
-        
-        print(f"🔄 Generating embeddings for {total_texts} text chunks...")
-        
-        for i, text in enumerate(texts):
-            try:
-                response = client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=text
-                )
-                embedding = response.data[0].embedding
-                embeddings.append(embedding)
-                
-                # Progress indicator
-                if (i + 1) % 3 == 0 or i == total_texts - 1:
-                    print(f"   Progress: {i + 1}/{total_texts} embeddings generated")
-                    
-            except Exception as e:
-                print(f"✗ Error generating embedding for chunk {i+1}: {e}")
-                return None
-        
-        print("✓ All embeddings generated successfully")
-        return embeddings
-        
+        return embedding_backend.embed(texts, allow_failures=True)
     except Exception as e:
         print(f"✗ Error with OpenAI embeddings: {e}")
         return None
 
-def create_vector_database(client, chunks, embeddings):
-    """Create ChromaDB collection and add documents with embeddings"""
+def split_failed_chunks(chunks, embeddings):
+    """Separate chunks that were embedded from those that failed; returns (chunks, embeddings, failed_ids)"""
+    embedded = [(chunk, embedding) for chunk, embedding in zip(chunks, embeddings) if embedding is not None]
+    failed_ids = [chunk['chunk_id'] for chunk, embedding in zip(chunks, embeddings) if embedding is None]
+    return [chunk for chunk, _ in embedded], [embedding for _, embedding in embedded], failed_ids
+
+class BuildCheckpoint:
+    """Progress of a build, saved to disk after every batch so an interrupted run can resume
+    
+    Written chunks are already durable in the collection and freshly embedded
+    vectors in the embedding cache, so the checkpoint records what kind of
+    build was running, with which embedding settings, how far it got and
+    which chunks failed to embed. A resumed run syncs against what was
+    stored instead of starting over.
+    """
+    
+    def __init__(self, full_rebuild, embedding, path=BUILD_CHECKPOINT_PATH):
+        self.path = path
+        self.full_rebuild = full_rebuild
+        self.embedding = embedding
+        self.batches_done = 0
+        self.chunks_done = 0
+        self.failed_chunk_ids = []
+    
+    @classmethod
+    def load(cls, path=BUILD_CHECKPOINT_PATH):
+        """Return the checkpoint left by an unfinished build, or None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        checkpoint = cls(data.get('full_rebuild', False), data.get('embedding'), path)
+        checkpoint.batches_done = data.get('batches_done', 0)
+        checkpoint.chunks_done = data.get('chunks_done', 0)
+        checkpoint.failed_chunk_ids = data.get('failed_chunk_ids', [])
+        return checkpoint
+    
+    def save(self):
+        """Atomically write the checkpoint as JSON"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'full_rebuild': self.full_rebuild,
+                'embedding': self.embedding,
+                'batches_done': self.batches_done,
+                'chunks_done': self.chunks_done,
+                'failed_chunk_ids': self.failed_chunk_ids,
+                'updated_at': time.time()
+            }, file)
+        os.replace(temp_path, self.path)
+    
+    def record_batch(self, batch_size, failed_ids):
+        self.batches_done += 1
+        self.chunks_done += batch_size
+        self.failed_chunk_ids.extend(failed_ids)
+        self.save()
+    
+    def finish(self):
+        """Remove the checkpoint, or keep it if some chunks still need to be embedded"""
+        if self.failed_chunk_ids:
+            self.save()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+def compute_content_hash(content):
+    """Return a stable SHA-256 hex digest of a chunk's text"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def build_chunk_metadata(chunk):
+    """Build the ChromaDB metadata dict stored alongside a chunk"""
+    metadata = {
+        'source': chunk['source'],
+        'chunk_number': chunk['chunk_number'],
+        'kind': chunk['kind'],
+        'content_hash': compute_content_hash(chunk['content'])
+    }
+    # Chroma metadata values can't be None, so symptom fields are only set where they apply
+    for key in ('symptom_index', 'symptom'):
+        if key in chunk:
+            metadata[key] = chunk[key]
+    return metadata
+
+def build_collection_metadata(embedding_backend):
+    """Collection-level metadata, including the embedding model used for the vectors"""
+    return {
+        "description": "Mental health support documents including GAD-7 protocol and CBT tips",
+        **embedding_backend.collection_metadata()
+    }
+
+def resolve_batch_size(client, batch_size):
+    """Clamp batch_size to the largest single write the Chroma backend accepts"""
+    try:
+        limit = client.get_max_batch_size()
+    except Exception:
+        limit = getattr(client, 'max_batch_size', None)
+    if isinstance(limit, int) and 0 < limit < batch_size:
+        print(f"⚠️  Batch size {batch_size} exceeds the backend limit; using {limit}")
+        return limit
+    return batch_size
+
+def prepare_ahead(batches, prepare):
+    """Yield (batch, prepare(batch)), preparing the next batch while the caller writes this one
+    
+    prepare (embedding) runs on a background thread one batch ahead, so
+    embedding of batch n+1 overlaps with insertion of batch n and at most
+    two batches are held in memory besides the one being read.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = None
+        for batch in batches:
+            future = executor.submit(contextvars.copy_context().run, prepare, batch)
+            if pending is not None:
+                yield pending[0], pending[1].result()
+            pending = (batch, future)
+        if pending is not None:
+            yield pending[0], pending[1].result()
+
+class ThroughputReport:
+    """Prints per-batch and overall chunks/s for a streaming write"""
+    
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time
+        self.total = 0
+    
+    def batch(self, batch_number, batch_size, detail):
+        now = time.perf_counter()
+        rate = batch_size / max(now - self.last_time, 1e-9)
+        self.last_time = now
+        self.total += batch_size
+        print(f"   Batch {batch_number}: {detail} ({rate:.0f} chunks/s, {self.total} total)")
+    
+    def finish(self):
+        elapsed = time.perf_counter() - self.start_time
+        print(f"⏱️  {self.total} chunks in {elapsed:.1f}s ({self.total / max(elapsed, 1e-9):.0f} chunks/s)")
+
+def create_vector_database(client, chunks, embedding_backend, batch_size=INGEST_BATCH_SIZE, checkpoint=None):
+    """Create ChromaDB collection and add chunks with embeddings, one batch at a time
+    
+    Each batch is embedded while the previous one is being added, and no
+    write is larger than batch_size (or the backend's maximum batch size).
+    Chunks that can't be embedded are skipped and recorded in checkpoint.
+    """
     try:
         # Try to delete existing collection if it exists
         try:
@@ -193,29 +356,37 @@ def create_vector_database(client, chunks, embeddings):
         # Create new collection
         collection = client.create_collection(
             name="mental_health_support",
-            metadata={"description": "Mental health support documents including GAD-7 protocol and CBT tips"}
+            metadata=build_collection_metadata(embedding_backend),
+            embedding_function=None
         )
         
-        # Prepare data for ChromaDB
-        ids = [chunk['chunk_id'] for chunk in chunks]
-        documents = [chunk['content'] for chunk in chunks]
-        metadatas = [
-            {
-                'source': chunk['source'],
-                'chunk_number': chunk['chunk_number'],
-                'total_chunks': chunk['total_chunks']
-            } 
-            for chunk in chunks
-        ]
+        batch_size = resolve_batch_size(client, batch_size)
+        print(f"🔄 Embedding chunks with {embedding_backend.model} in batches of {batch_size}...")
         
-        # Add documents to collection
-        collection.add(
-            embeddings=embeddings,
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        def embed_batch(batch):
+            return get_openai_embeddings([chunk['content'] for chunk in batch], embedding_backend)
+        
+        report = ThroughputReport()
+        batches = prepare_ahead(iter_batches(chunks, batch_size), embed_batch)
+        for batch_number, (batch, embeddings) in enumerate(batches, 1):
+            if not embeddings:
+                print(f"✗ Failed to generate embeddings for batch {batch_number}")
+                return None
+            
+            stored_chunks, embeddings, failed_ids = split_failed_chunks(batch, embeddings)
+            if stored_chunks:
+                collection.add(
+                    embeddings=embeddings,
+                    documents=[chunk['content'] for chunk in stored_chunks],
+                    metadatas=[build_chunk_metadata(chunk) for chunk in stored_chunks],
+                    ids=[chunk['chunk_id'] for chunk in stored_chunks]
+                )
+            if checkpoint:
+                checkpoint.record_batch(len(batch), failed_ids)
+            report.batch(batch_number, len(batch), f"stored {len(stored_chunks)} chunks" +
+                         (f", {len(failed_ids)} failed" if failed_ids else ""))
         
+        report.finish()
         print("✓ Vector database created and populated successfully")
         return collection
         
@@ -223,6 +394,209 @@ def create_vector_database(client, chunks, embeddings):
         print(f"✗ Error creating vector database: {e}")
         return None
 
+def load_stored_metadata(collection, chunk_ids):
+    """Return {chunk_id: metadata} for the given ids that are already stored"""
+    stored = collection.get(ids=chunk_ids, include=["metadatas"])
+    return {chunk_id: metadata or {} for chunk_id, metadata in zip(stored['ids'], stored['metadatas'])}
+
+def is_stale_chunk_id(chunk_id, document_chunk_counts):
+    """Whether a stored chunk id belongs to no current chunk
+    
+    Ids are "<document>_chunk_<n>" with n counting from 1 within the
+    document, so a per-document chunk count identifies every current id.
+    """
+    doc_name, _, chunk_number = chunk_id.rpartition('_chunk_')
+    if not doc_name or not chunk_number.isdigit():
+        return True
+    return not 1 <= int(chunk_number) <= document_chunk_counts.get(doc_name, 0)
+
+def find_stale_chunk_ids(collection, document_chunk_counts, page_size=1000):
+    """List stored chunk ids that are no longer produced, reading stored ids a page at a time"""
+    stale_ids = []
+    offset = 0
+    while True:
+        page = collection.get(include=[], limit=page_size, offset=offset)
+        stale_ids.extend(chunk_id for chunk_id in page['ids'] if is_stale_chunk_id(chunk_id, document_chunk_counts))
+        if len(page['ids']) < page_size:
+            return stale_ids
+        offset += page_size
+
+def sync_vector_database(client, chunks, embedding_backend, batch_size=INGEST_BATCH_SIZE, checkpoint=None):
+    """Incrementally sync the collection with the current chunks
+    
+    Chunks are consumed as a stream in batches. Each chunk's content hash is
+    compared with the one stored in its metadata, fetched for that batch's
+    ids only. Only new or changed chunks are embedded (one batch ahead of
+    the upserts) and upserted, chunks that no longer exist are found from
+    per-document chunk counts and deleted once the stream is finished, so
+    memory doesn't grow with the size of the collection, and unchanged
+    vectors are left alone, so the collection stays available to app.py
+    throughout. Changed chunks that can't be embedded keep their old version
+    and are recorded in checkpoint, so the next run retries them. chunks is
+    a ChunkStream, whose per-document counts identify the current ids.
+    """
+    try:
+        # Open without metadata first: get_or_create_collection(metadata=...) would
+        # overwrite the recorded embedding model before it could be checked
+        try:
+            collection = client.get_collection(name="mental_health_support", embedding_function=None)
+        except Exception:
+            collection = None  # Collection doesn't exist yet
+        
+        # Vectors from a different embedding model (or width) can't be mixed in one index
+        if collection is not None:
+            try:
+                embedding_backend.check_collection(collection)
+            except EmbeddingMismatchError as e:
+                print(f"⚠️  {e}; recreating the collection")
+                client.delete_collection("mental_health_support")
+                collection = None
+        
+        if collection is None:
+            collection = client.create_collection(
+                name="mental_health_support",
+                metadata=build_collection_metadata(embedding_backend),
+                embedding_function=None
+            )
+        elif collection.metadata != build_collection_metadata(embedding_backend):
+            collection.modify(metadata=build_collection_metadata(embedding_backend))
+        
+        batch_size = resolve_batch_size(client, batch_size)
+        seen_count = 0
+        changed_count = 0
+        metadata_only_count = 0
+        
+        def plan_batch(batch):
+            """Split a batch into changed and metadata-only chunks and embed the changed ones"""
+            changed_chunks = []
+            metadata_only_chunks = []
+            existing_metadata = load_stored_metadata(collection, [chunk['chunk_id'] for chunk in batch])
+            for chunk in batch:
+                metadata = build_chunk_metadata(chunk)
+                stored = existing_metadata.get(chunk['chunk_id'])
+                if stored is None or stored.get('content_hash') != metadata['content_hash']:
+                    changed_chunks.append(chunk)
+                elif stored != metadata:
+                    metadata_only_chunks.append(chunk)
+            
+            embeddings = None
+            if changed_chunks:
+                embeddings = get_openai_embeddings([chunk['content'] for chunk in changed_chunks], embedding_backend)
+            return changed_chunks, metadata_only_chunks, embeddings
+        
+        report = ThroughputReport()
+        batches = prepare_ahead(iter_batches(chunks, batch_size), plan_batch)
+        for batch_number, (batch, (changed_chunks, metadata_only_chunks, embeddings)) in enumerate(batches, 1):
+            seen_count += len(batch)
+            
+            failed_ids = []
+            if changed_chunks:
+                if not embeddings:
+                    print(f"✗ Failed to generate embeddings for changed chunks in batch {batch_number}")
+                    return None
+                
+                changed_chunks, embeddings, failed_ids = split_failed_chunks(changed_chunks, embeddings)
+            if changed_chunks:
+                collection.upsert(
+                    embeddings=embeddings,
+                    documents=[chunk['content'] for chunk in changed_chunks],
+                    metadatas=[build_chunk_metadata(chunk) for chunk in changed_chunks],
+                    ids=[chunk['chunk_id'] for chunk in changed_chunks]
+                )
+            
+            if metadata_only_chunks:
+                collection.update(
+                    metadatas=[build_chunk_metadata(chunk) for chunk in metadata_only_chunks],
+                    ids=[chunk['chunk_id'] for chunk in metadata_only_chunks]
+                )
+            
+            changed_count += len(changed_chunks) + len(failed_ids)
+            metadata_only_count += len(metadata_only_chunks)
+            if checkpoint:
+                checkpoint.record_batch(len(batch), failed_ids)
+            report.batch(batch_number, len(batch), f"upserted {len(changed_chunks)}, "
+                         f"updated metadata for {len(metadata_only_chunks)} of {len(batch)} chunks" +
+                         (f", {len(failed_ids)} failed" if failed_ids else ""))
+        
+        # Only safe once every current chunk has been seen
+        stale_ids = find_stale_chunk_ids(collection, chunks.documents)
+        for stale_batch in iter_batches(stale_ids, batch_size):
+            collection.delete(ids=stale_batch)
+        
+        report.finish()
+        unchanged = seen_count - changed_count - metadata_only_count
+        print(f"🔎 Sync result: {changed_count} new/changed, {unchanged} unchanged, "
+              f"{metadata_only_count} metadata-only, {len(stale_ids)} removed")
+        
+        if not (changed_count or metadata_only_count or stale_ids):
+            print("✓ Vector database already up to date")
+        else:
+            print("✓ Vector database synced successfully")
+        return collection
+        
+    except Exception as e:
+        print(f"✗ Error syncing vector database: {e}")
+        return None
+
+def create_protocol_index(documents):
+    """Compile and save the symptom-indexed protocol lookup table used by app.py"""
+    index = build_protocol_index(documents)
+    if not index:
+        print("⚠️  Could not find 7 questions, empathetic responses and strategies; protocol index not written")
+        return False
+    
+    try:
+        write_protocol_index(index)
+        print(f"✓ Protocol index written to {PROTOCOL_INDEX_PATH} ({len(index['symptoms'])} symptoms)")
+        return True
+    except Exception as e:
+        print(f"✗ Error writing protocol index: {e}")
+        return False
+
+def create_vector_snapshot(collection, vector_dtype='float32', recall_k=3):
+    """Export the collection as the memory-mapped snapshot used by app.py with VECTOR_BACKEND=snapshot
+    
+    For compressed dtypes, recall@k of the snapshot is checked against exact
+    float32 search over the stored chunks.
+    """
+    try:
+        from vector_snapshot import VECTOR_SNAPSHOT_PATH, SnapshotCollection, export_collection_snapshot, measure_recall
+        header = export_collection_snapshot(collection, dtype=vector_dtype)
+        size_kb = os.path.getsize(VECTOR_SNAPSHOT_PATH) / 1024
+        print(f"✓ Vector snapshot written to {VECTOR_SNAPSHOT_PATH} "
+              f"({header['rows']} x {header['dimensions']} {header['dtype']}, {size_kb:.1f} KB)")
+        
+        if vector_dtype != 'float32':
+            snapshot = SnapshotCollection(VECTOR_SNAPSHOT_PATH)
+            try:
+                recall = measure_recall(collection, snapshot, recall_k)
+            finally:
+                snapshot.close()
+            print(f"🎯 Recall@{recall_k} of {vector_dtype} vectors vs float32: {recall:.1%}")
+            if recall < 0.95:
+                print("⚠️  Recall is below 95%; consider a wider dtype or more dimensions")
+        return True
+    except Exception as e:
+        print(f"✗ Error writing vector snapshot: {e}")
+        return False
+
+def create_lexical_index(builder):
+    """Save the BM25 index over chunk lines used by app.py for keyword and hybrid search
+    
+    builder is the LexicalIndexBuilder the chunk stream fed while it was
+    being embedded; its segments are merged straight into the index file.
+    """
+    try:
+        term_count = builder.write()
+        print(f"✓ Lexical index written to {LEXICAL_INDEX_PATH} "
+              f"({builder.line_count} lines, {term_count} terms)")
+        return True
+    except Exception as e:
+        print(f"✗ Error writing lexical index: {e}")
+        return False
+    finally:
+        builder.close()
+
 def verify_database(collection):
     """Verify the database was created correctly"""
     try:
@@ -244,8 +618,36 @@ def verify_database(collection):
         print(f"✗ Error verifying database: {e}")
         return False
 
-def main():
-    """Main function to orchestrate the document processing"""
+def resume_command(paths, dimensions=None):
+    """Command line that re-runs this build so it resumes from its checkpoint"""
+    command = ['python', 'build_database.py']
+    if list(paths) != list(DEFAULT_DOCUMENT_PATHS):
+        command.extend(paths)
+    # The checkpoint is only resumed with the same embedding settings
+    if dimensions:
+        command.append(f"--dimensions {dimensions}")
+    return ' '.join(command)
+
+def main(full_rebuild=False, dimensions=None, vector_dtype='float32', paths=DEFAULT_DOCUMENT_PATHS, workers=None,
+         batch_size=INGEST_BATCH_SIZE):
+    """Main function to orchestrate the document processing
+    
+    By default the collection is synced incrementally; pass full_rebuild=True
+    to drop it and re-embed every chunk. dimensions requests shortened
+    embeddings from the model (app.py needs the same EMBEDDING_DIMENSIONS),
+    and vector_dtype sets how the exported snapshot stores vectors. paths
+    are document files or directory trees; they are read, chunked on worker
+    processes, embedded and stored as one streaming pipeline, batch_size
+    chunks per write.
+    
+    Progress is checkpointed after every batch. If a previous run was
+    interrupted or left chunks it couldn't embed, the next run syncs against
+    what it stored, so only missing chunks are embedded; an interrupted full
+    rebuild resumes this way too instead of dropping the collection again.
+    
+    Returns (chunks stored, collection); chunks that failed to embed are not
+    counted.
+    """
     print("🚀 Starting Document Processing Pipeline")
     print("=" * 50)
     
@@ -257,17 +659,21 @@ def main():
         print("✗ OpenAI API key is required for embeddings. Exiting.")
         return
     
-    # Step 2: Load Documents
-    print("\n2. Loading documents...")
-    documents = load_documents()
+    embedding_options = {'dimensions': dimensions} if dimensions else {}
+    embedding_backend = create_embedding_backend(api_key, **embedding_options)
     
-    if not documents:
-        print("✗ No documents loaded. Exiting.")
+    # Step 2: Find Documents
+    print("\n2. Finding documents...")
+    document_files = find_documents(paths)
+    
+    if not document_files:
+        print("✗ No documents found. Exiting.")
         return
     
-    # Step 3: Split Text into Chunks
-    print("\n3. Splitting text into chunks...")
-    chunks = split_text_into_chunks(documents)
+    # Step 3: Set Up Chunking (runs lazily as chunks are embedded)
+    print("\n3. Setting up streaming chunk pipeline...")
+    chunks = ChunkStream(split_text_into_chunks(document_files, workers))
+    print(f"✓ Chunks will be split on {workers or os.cpu_count() or 1} worker processes")
     
     # Step 4: Initialize ChromaDB
     print("\n4. Initializing ChromaDB...")
@@ -277,43 +683,102 @@ def main():
         print("✗ Failed to initialize ChromaDB. Exiting.")
         return
     
-    # Step 5: Generate Embeddings
-    print("\n5. Generating embeddings...")
-    chunk_texts = [chunk['content'] for chunk in chunks]
-    embeddings = get_openai_embeddings(chunk_texts, api_key)
+    previous = BuildCheckpoint.load()
+    if previous and previous.embedding != embedding_backend.collection_metadata():
+        print("⚠️  Ignoring checkpoint from a build with different embedding settings")
+        previous = None
+    # An explicit full rebuild only resumes an interrupted full rebuild, not a sync
+    resume = previous is not None and (previous.full_rebuild or not full_rebuild)
+    if resume:
+        print(f"↩️  Resuming from checkpoint: {previous.chunks_done} chunks processed, "
+              f"{len(previous.failed_chunk_ids)} failed chunks to retry")
     
-    if not embeddings:
-        print("✗ Failed to generate embeddings. Exiting.")
-        return
+    # A resumed full rebuild is still marked as one until it completes
+    checkpoint = BuildCheckpoint(full_rebuild or (resume and previous.full_rebuild),
+                                 embedding_backend.collection_metadata())
+    checkpoint.save()
     
-    # Step 6: Create Vector Database
-    print("\n6. Creating vector database...")
-    collection = create_vector_database(chroma_client, chunks, embeddings)
+    if full_rebuild and not resume:
+        # Steps 5-6: Embed every chunk and add it batch by batch
+        print("\n5-6. Creating vector database (streaming)...")
+        collection = create_vector_database(chroma_client, chunks, embedding_backend, batch_size, checkpoint)
+    else:
+        # Steps 5-6: Embed and upsert only new or changed chunks
+        print("\n5-6. Syncing vector database (incremental, streaming)...")
+        collection = sync_vector_database(chroma_client, chunks, embedding_backend, batch_size, checkpoint)
     
     if not collection:
-        print("✗ Failed to create vector database. Exiting.")
+        print("✗ Failed to create vector database. Re-run to resume from the checkpoint. Exiting.")
         return
+    checkpoint.finish()
+    failed_count = len(checkpoint.failed_chunk_ids)
+    stored_count = chunks.total - failed_count
+    print(f"✓ Split {len(chunks.documents)} documents into {chunks.total} chunks")
     
     # Step 7: Verify Database
     print("\n7. Verifying database...")
     verify_database(collection)
     
+    # Step 8: Compile Protocol Index
+    print("\n8. Compiling protocol index...")
+    create_protocol_index(load_protocol_documents(document_files))
+    
+    # Step 9: Export Vector Snapshot
+    print("\n9. Exporting vector snapshot...")
+    create_vector_snapshot(collection, vector_dtype)
+    
+    # Step 10: Build Lexical Index
+    print("\n10. Building lexical index...")
+    create_lexical_index(chunks.lexical_index)
+    
     # Final confirmation
     print("\n" + "=" * 50)
-    print("🎉 SUCCESS! Vector Database Created")
-    print("=" * 50)
-    print("✅ ChromaDB database has been successfully created and populated!")
+    if failed_count:
+        print("⚠️  PARTIAL SUCCESS: Vector Database Created With Missing Chunks")
+        print("=" * 50)
+        print(f"⚠️  {failed_count} of {chunks.total} chunks could not be embedded and are not stored")
+        print(f"⚠️  Run `{resume_command(paths, dimensions)}` to retry them")
+    else:
+        print("🎉 SUCCESS! Vector Database Created")
+        print("=" * 50)
+        print("✅ ChromaDB database has been successfully created and populated!")
     print("✅ Database location: ./db/")
     print("✅ Collection name: mental_health_support")
-    print(f"✅ Total document chunks stored: {len(chunks)}")
-    print("✅ All chunks have been converted to vectors using OpenAI embeddings")
+    print(f"✅ Total document chunks stored: {stored_count} from {len(chunks.documents)} documents")
+    print(f"✅ Stored chunks have been converted to vectors using {embedding_backend.model}")
     print("\n🔍 Database Contents:")
     print(f"   - GAD-7 Conversational Protocol chunks")
     print(f"   - CBT & Mindfulness Coping Strategies chunks")
     print(f"   - Each chunk includes source metadata and embeddings")
-    print("\n🚀 Your mental health support vector database is ready for use!")
+    if not failed_count:
+        print("\n🚀 Your mental health support vector database is ready for use!")
     
-    return chunks, collection
+    return stored_count, collection
+
+def parse_args():
+    """Parse command-line options for the build script"""
+    parser = argparse.ArgumentParser(description="Build the mental_health_support vector database")
+    parser.add_argument("paths", nargs="*", default=list(DEFAULT_DOCUMENT_PATHS),
+                        help="document files or directories to ingest (default: gad7_protocol.txt cbt_tips.txt)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes used to split documents into chunks (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE,
+                        help=f"chunks embedded and written per batch (default: {INGEST_BATCH_SIZE})")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="delete the collection and re-embed every chunk instead of syncing incrementally")
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="request shortened embeddings with this many dimensions (default: EMBEDDING_DIMENSIONS "
+                             "or the model's full width)")
+    parser.add_argument("--vector-dtype", choices=("float32", "float16", "int8"), default="float32",
+                        help="storage type for vectors in the exported snapshot; int8 stores per-vector scales")
+    parser.add_argument("--check-deps", action="store_true",
+                        help="check for required packages and pip install any that are missing before building")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    chunks = main() 
\ No newline at end of file
+    args = parse_args()
+    if args.check_deps and not check_and_install_dependencies():
+        print("Failed to install required dependencies. Exiting.")
+        sys.exit(1)
+    main(full_rebuild=args.full_rebuild, dimensions=args.dimensions, vector_dtype=args.vector_dtype,
+         paths=args.paths, workers=args.workers, batch_size=args.batch_size)
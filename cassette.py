@@ -0,0 +1,223 @@
+"""
+OpenAI Record/Replay Cassettes
+Records chat completion and embedding calls to a local JSONL cassette and
+replays them later without network access, so a full check-in (app.py) or a
+rebuild (build_database.py) can be timed on an offline machine and our own
+overhead measured separately from API latency.
+
+Enable through environment variables read by openai_transport.get_openai_client:
+
+    OPENAI_CASSETTE_MODE=record|replay
+    OPENAI_CASSETTE_PATH=./cassettes/openai.jsonl
+    OPENAI_CASSETTE_LATENCY=recorded|none|fixed:0.3|uniform:0.1,0.5|lognormal:0.4,0.5
+
+Replay needs no real API key, but the scripts still check that
+OPENAI_API_KEY is set, so use any placeholder value.
+
+Requests are matched by a hash of the endpoint and request parameters.
+Identical requests recorded several times (e.g. sampled completions) are
+replayed in recorded order, cycling when exhausted. Streaming completions are
+recorded chunk by chunk and replayed as a stream.
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+DEFAULT_CASSETTE_PATH = './cassettes/openai.jsonl'
+
+# Per-call transport options that don't change the response
+IGNORED_REQUEST_KEYS = {'timeout', 'deadline'}
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request was never recorded"""
+
+def request_key(endpoint, request):
+    """Stable hash of an endpoint and its request parameters"""
+    canonical = {key: value for key, value in request.items() if key not in IGNORED_REQUEST_KEYS}
+    payload = json.dumps([endpoint, canonical], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def to_plain(value):
+    """Convert SDK response objects into JSON-serializable data"""
+    if hasattr(value, 'model_dump'):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    return value
+
+def to_namespace(value):
+    """Convert recorded data back into attribute-access objects like the SDK's"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
+
+def parse_latency_model(spec):
+    """Parse an OPENAI_CASSETTE_LATENCY spec into a function(recorded_seconds) -> seconds"""
+    spec = (spec or 'recorded').strip().lower()
+    name, _, args = spec.partition(':')
+    params = [float(part) for part in args.split(',') if part]
+
+    if name == 'recorded':
+        return lambda recorded: recorded
+    if name == 'none':
+        return lambda recorded: 0.0
+    if name == 'fixed':
+        return lambda recorded: params[0]
+    if name == 'uniform':
+        return lambda recorded: random.uniform(params[0], params[1])
+    if name == 'lognormal':
+        # params: median seconds, sigma of the underlying normal
+        median, sigma = params
+        return lambda recorded: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown cassette latency model: {spec}")
+
+class Cassette:
+    """Thread-safe JSONL store of recorded interactions"""
+
+    def __init__(self, path=DEFAULT_CASSETTE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._interactions = {}
+        self._cursors = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self._interactions.setdefault(interaction['key'], []).append(interaction)
+
+    def append(self, interaction):
+        """Persist one interaction"""
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(interaction) + '\n')
+            self._interactions.setdefault(interaction['key'], []).append(interaction)
+
+    def next(self, key):
+        """Return the next recorded interaction for key, cycling through repeats"""
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return recorded[cursor % len(recorded)]
+
+class _RecordingEndpoint:
+    """Calls the real endpoint and records request/response pairs"""
+
+    def __init__(self, endpoint, create, cassette):
+        self.endpoint = endpoint
+        self._create = create
+        self.cassette = cassette
+
+    def create(self, **request):
+        key = request_key(self.endpoint, request)
+        start_time = time.perf_counter()
+        response = self._create(**request)
+
+        if request.get('stream'):
+            return self._record_stream(key, request, response, start_time)
+
+        self.cassette.append({
+            'key': key,
+            'endpoint': self.endpoint,
+            'request': to_plain({k: v for k, v in request.items() if k not in IGNORED_REQUEST_KEYS}),
+            'response': to_plain(response),
+            'latency': time.perf_counter() - start_time
+        })
+        return response
+
+    def _record_stream(self, key, request, stream, start_time):
+        chunks = []
+        first_chunk_time = None
+        for chunk in stream:
+            if first_chunk_time is None:
+                first_chunk_time = time.perf_counter()
+            chunks.append(to_plain(chunk))
+            yield chunk
+
+        end_time = time.perf_counter()
+        self.cassette.append({
+            'key': key,
+            'endpoint': self.endpoint,
+            'request': to_plain({k: v for k, v in request.items() if k not in IGNORED_REQUEST_KEYS}),
+            'stream': True,
+            'chunks': chunks,
+            'ttft': (first_chunk_time or end_time) - start_time,
+            'latency': end_time - start_time
+        })
+
+class _ReplayingEndpoint:
+    """Serves recorded responses with synthetic latency"""
+
+    def __init__(self, endpoint, cassette, latency_model):
+        self.endpoint = endpoint
+        self.cassette = cassette
+        self.latency_model = latency_model
+
+    def create(self, **request):
+        key = request_key(self.endpoint, request)
+        interaction = self.cassette.next(key)
+        if interaction is None:
+            raise CassetteMiss(f"No recorded {self.endpoint} response for this request (key {key[:12]})")
+
+        latency = max(0.0, self.latency_model(interaction.get('latency', 0.0)))
+        if interaction.get('stream'):
+            return self._replay_stream(interaction, latency)
+
+        time.sleep(latency)
+        return to_namespace(interaction['response'])
+
+    def _replay_stream(self, interaction, latency):
+        chunks = interaction['chunks']
+        recorded_latency = interaction.get('latency') or 0.0
+        # Keep the recorded ratio of time-to-first-token to total time
+        ttft_share = (interaction.get('ttft', 0.0) / recorded_latency) if recorded_latency else 0.0
+        time.sleep(latency * ttft_share)
+        gap = (latency * (1 - ttft_share)) / max(1, len(chunks) - 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(gap)
+            yield to_namespace(chunk)
+
+class CassetteClient:
+    """openai.OpenAI look-alike that records to or replays from a cassette"""
+
+    def __init__(self, mode, cassette, raw_client=None, latency_model=None):
+        if mode == 'record':
+            self.chat = SimpleNamespace(completions=_RecordingEndpoint(
+                'chat.completions', raw_client.chat.completions.create, cassette))
+            self.embeddings = _RecordingEndpoint('embeddings', raw_client.embeddings.create, cassette)
+        elif mode == 'replay':
+            latency_model = latency_model or parse_latency_model(None)
+            self.chat = SimpleNamespace(completions=_ReplayingEndpoint('chat.completions', cassette, latency_model))
+            self.embeddings = _ReplayingEndpoint('embeddings', cassette, latency_model)
+        else:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.mode = mode
+
+def get_cassette_mode():
+    """Return 'record', 'replay' or None from OPENAI_CASSETTE_MODE"""
+    mode = os.getenv('OPENAI_CASSETTE_MODE', '').strip().lower()
+    return mode if mode in ('record', 'replay') else None
+
+def create_cassette_client(mode, raw_client=None):
+    """Build a CassetteClient configured from environment variables"""
+    cassette = Cassette(os.getenv('OPENAI_CASSETTE_PATH', DEFAULT_CASSETTE_PATH))
+    latency_model = parse_latency_model(os.getenv('OPENAI_CASSETTE_LATENCY'))
+    return CassetteClient(mode, cassette, raw_client, latency_model)
@@ -0,0 +1,143 @@
+"""
+Embedding Cache
+A persistent, size-bounded on-disk cache of embedding vectors shared by
+build_database.py (ingestion) and app.py (retrieval queries).
+
+Entries are keyed by (model, dimensions, SHA-256 of the text) and stored in a
+SQLite database in WAL mode, so several app processes can read it at the same
+time while another process writes. When the cache grows past max_entries the
+least recently used entries are evicted.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+DEFAULT_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', './db/embedding_cache.sqlite3')
+DEFAULT_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '50000'))
+
+# Only refresh an entry's last-access time this often, so hot reads stay read-only
+TOUCH_INTERVAL_SECONDS = 300
+
+def hash_text(text):
+    """Return the SHA-256 hex digest used to key a text in the cache"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def encode_vector(vector):
+    """Pack a list of floats into compact float32 bytes"""
+    return array('f', vector).tobytes()
+
+def decode_vector(blob):
+    """Unpack float32 bytes back into a list of floats"""
+    values = array('f')
+    values.frombytes(blob)
+    return values.tolist()
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of embeddings keyed by (model, dimensions, text hash)"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+    def get_many(self, model, dimensions, texts):
+        """Return cached vectors for texts, with None for each miss"""
+        dimensions = dimensions or 0
+        now = time.time()
+        results = []
+        stale_keys = []
+
+        with self._lock:
+            for text in texts:
+                text_hash = hash_text(text)
+                row = self._conn.execute(
+                    "SELECT vector, last_access FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    (model, dimensions, text_hash)
+                ).fetchone()
+
+                if row is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+
+                self.hits += 1
+                results.append(decode_vector(row[0]))
+                if now - row[1] > TOUCH_INTERVAL_SECONDS:
+                    stale_keys.append((now, model, dimensions, text_hash))
+
+            if stale_keys:
+                try:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                        stale_keys
+                    )
+                    self._conn.commit()
+                except sqlite3.OperationalError:
+                    # Another process holds the write lock; recency is best-effort
+                    self._conn.rollback()
+
+        return results
+
+    def put_many(self, model, dimensions, texts, vectors):
+        """Store vectors for texts and evict least recently used entries if over capacity"""
+        dimensions = dimensions or 0
+        now = time.time()
+        rows = [
+            (model, dimensions, hash_text(text), encode_vector(vector), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_access) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """Return the process-wide shared embedding cache, opening it on first use"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
@@ -0,0 +1,177 @@
+"""
+Embedding Backend
+The single embedding abstraction used by both build_database.py (to embed
+stored chunks) and app.py (to embed retrieval queries), so stored and query
+vectors always come from the same model.
+
+The model and dimensions are recorded in the collection metadata at build
+time and checked when app.py connects. Collections are always opened with
+embedding_function=None, so Chroma never loads its default local model.
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from embedding_cache import get_embedding_cache
+from tracing import span
+
+DEFAULT_EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+DEFAULT_EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '0')) or None
+
+# Collections built before the model was recorded used these settings
+LEGACY_EMBEDDING_MODEL = 'text-embedding-3-small'
+
+class EmbeddingMismatchError(Exception):
+    """Raised when a collection was built with a different embedding model than the backend"""
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for batch sizing"""
+    return max(1, len(text) // 4)
+
+def make_embedding_batches(texts, max_batch_items=100, max_batch_tokens=50000):
+    """Group texts into batches of (start_index, batch_texts) within item/token limits"""
+    batches = []
+    current = []
+    current_tokens = 0
+    start = 0
+
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_batch_items or current_tokens + tokens > max_batch_tokens):
+            batches.append((start, current))
+            current = []
+            current_tokens = 0
+        if not current:
+            start = i
+        current.append(text)
+        current_tokens += tokens
+
+    if current:
+        batches.append((start, current))
+
+    return batches
+
+class OpenAIEmbeddingBackend:
+    """Batched, concurrent, cached embeddings from an OpenAI embedding model"""
+
+    def __init__(self, openai_client, model=DEFAULT_EMBEDDING_MODEL, dimensions=DEFAULT_EMBEDDING_DIMENSIONS,
+                 use_cache=True, max_batch_items=100, max_batch_tokens=50000, max_workers=4):
+        self.openai_client = openai_client
+        self.model = model
+        self.dimensions = dimensions
+        self.cache = get_embedding_cache() if use_cache else None
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_workers = max(1, max_workers)
+
+    def _embed_batch(self, batch_texts):
+        """Embed one batch of texts in a single API request"""
+        kwargs = {'model': self.model, 'input': batch_texts}
+        if self.dimensions:
+            kwargs['dimensions'] = self.dimensions
+        response = self.openai_client.embeddings.create(**kwargs)
+        # The API may return items out of order; 'index' is authoritative
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _embed_batch_or_each(self, batch_texts):
+        """Embed one batch, retrying its texts one at a time if the batch request fails
+
+        Texts that still fail on their own come back as None, so one bad text
+        doesn't cost the rest of its batch.
+        """
+        try:
+            return self._embed_batch(batch_texts)
+        except Exception:
+            if len(batch_texts) == 1:
+                return [None]
+
+        embeddings = []
+        for text in batch_texts:
+            try:
+                embeddings.extend(self._embed_batch([text]))
+            except Exception:
+                embeddings.append(None)
+        return embeddings
+
+    def embed(self, texts, on_progress=None, allow_failures=False):
+        """Return embeddings for texts in input order, embedding only uncached texts
+
+        Uncached texts are packed into batched requests with up to max_workers
+        batches in flight, and each finished batch is written to the cache.
+        on_progress(done, total) is called after each batch. Raises on API
+        errors, unless allow_failures is set: then a failed batch is retried
+        text by text and texts that can't be embedded are returned as None.
+        """
+        texts = list(texts)
+        with span('embeddings.embed', model=self.model, texts=len(texts)) as current:
+            if self.cache:
+                embeddings = self.cache.get_many(self.model, self.dimensions, texts)
+            else:
+                embeddings = [None] * len(texts)
+
+            # Embed each distinct uncached text once
+            missing_texts = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+            current.set(cache_hits=len(texts) - sum(embedding is None for embedding in embeddings),
+                        cache_misses=len(missing_texts))
+            if not missing_texts:
+                return embeddings
+
+            batches = make_embedding_batches(missing_texts, self.max_batch_items, self.max_batch_tokens)
+            embed_batch = self._embed_batch_or_each if allow_failures else self._embed_batch
+            fresh = {}
+
+            if len(batches) == 1:
+                completed = [(batches[0][1], embed_batch(batches[0][1]))]
+                self._store(fresh, completed[0][0], completed[0][1], len(missing_texts), on_progress)
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                    # Each worker runs in a copy of this context so its API spans nest under this one
+                    futures = {
+                        executor.submit(contextvars.copy_context().run, embed_batch, batch_texts): batch_texts
+                        for _, batch_texts in batches
+                    }
+                    try:
+                        for future in as_completed(futures):
+                            self._store(fresh, futures[future], future.result(), len(missing_texts), on_progress)
+                    except Exception:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+
+            if allow_failures:
+                current.set(failed=sum(embedding is None for embedding in fresh.values()))
+            return [embedding if embedding is not None else fresh[text] for text, embedding in zip(texts, embeddings)]
+
+    def _store(self, fresh, batch_texts, batch_embeddings, total, on_progress):
+        """Record a finished batch in the result map and the cache"""
+        fresh.update(zip(batch_texts, batch_embeddings))
+        if self.cache:
+            # Failed texts (None) are left uncached so the next run retries them
+            embedded = [(text, embedding) for text, embedding in zip(batch_texts, batch_embeddings)
+                        if embedding is not None]
+            if embedded:
+                self.cache.put_many(self.model, self.dimensions, [text for text, _ in embedded],
+                                    [embedding for _, embedding in embedded])
+        if on_progress:
+            on_progress(len(fresh), total)
+
+    def collection_metadata(self):
+        """Metadata recorded on the collection describing how its vectors were made"""
+        return {
+            'embedding_model': self.model,
+            'embedding_dimensions': self.dimensions or 0
+        }
+
+    def check_collection(self, collection):
+        """Raise EmbeddingMismatchError if the collection was built with a different model"""
+        metadata = collection.metadata or {}
+        model = metadata.get('embedding_model', LEGACY_EMBEDDING_MODEL)
+        dimensions = metadata.get('embedding_dimensions', 0) or None
+
+        if model != self.model or dimensions != self.dimensions:
+            raise EmbeddingMismatchError(
+                f"collection '{collection.name}' was built with {model} "
+                f"(dimensions={dimensions or 'default'}) but the app is configured for "
+                f"{self.model} (dimensions={self.dimensions or 'default'})"
+            )
@@ -0,0 +1,286 @@
+"""
+GAD-7 Answer Scoring
+A fast local classifier that maps natural-language GAD-7 answers to scores
+0-3 using the "Scoring Interpretation Rules" in gad7_protocol.txt plus a
+small synonym table. app.get_gad7_score only escalates to the LLM when the
+local confidence is below the threshold.
+
+LLM scores are memoized by normalized answer in a two-level cache: an
+in-process LRU in front of a SQLite store shared by all app processes. Entries
+are keyed by a fingerprint of the scoring model and prompt, so changing either
+means they are no longer hit; processes running different prompt versions
+can share one store without evicting each other's entries.
+
+Retention: the store holds users' normalized answers, so every entry, for any
+fingerprint, is dropped once it is older than GAD7_SCORE_CACHE_TTL_DAYS
+(default 30; entries past it are never served), and the store is capped at
+GAD7_SCORE_CACHE_MAX_ROWS rows, dropping the oldest first. Expired rows are
+purged whenever a cache is opened.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+GAD7_PROTOCOL_PATH = 'gad7_protocol.txt'
+DEFAULT_CONFIDENCE_THRESHOLD = 0.75
+SCORE_CACHE_PATH = os.getenv('GAD7_SCORE_CACHE_PATH', './db/gad7_score_cache.sqlite3')
+SCORE_CACHE_TTL_SECONDS = float(os.getenv('GAD7_SCORE_CACHE_TTL_DAYS', '30')) * 24 * 3600
+SCORE_CACHE_MAX_ROWS = int(os.getenv('GAD7_SCORE_CACHE_MAX_ROWS', '100000'))
+
+RULE_PATTERN = re.compile(r'^\s*-\s*Natural language (.+?) maps to score ([0-3])', re.IGNORECASE)
+QUOTED_PATTERN = re.compile(r'"([^"]+)"')
+
+# Standard GAD-7 response labels plus common phrasings not listed in the protocol
+SYNONYMS = {
+    0: ["not at all", "nope", "never", "none", "not really", "zero", "no response",
+        "not once", "no days", "not in the slightest"],
+    1: ["several days", "sometimes", "a few days", "a little bit", "a little", "a bit", "occasionally",
+        "once or twice", "a couple of days", "a couple days", "some days", "now and then", "rarely",
+        "here and there", "every now and then", "once in a while"],
+    2: ["more than half the days", "often", "a lot", "frequently", "most days", "quite a bit",
+        "quite often", "many days", "half the time", "more often than not", "pretty often"],
+    3: ["nearly every day", "constantly", "all the time", "every day", "always", "daily", "nonstop",
+        "almost every day", "every single day", "all day", "almost always", "24/7"]
+}
+
+# Only trusted when they are the whole answer ("no idea" is not a 0)
+EXACT_ONLY_SYNONYMS = {"no": 0, "nah": 0, "no not really": 0}
+
+NEGATIONS = {"not", "no", "never", "dont", "don't", "didnt", "didn't", "hardly", "barely", "isnt", "wasnt"}
+
+# Words that can surround a frequency phrase without changing its meaning ("um, I'd say often").
+# Any other leftover word means the phrase may be a modifier ("I can never relax", "always fine").
+FILLER_WORDS = {
+    "i", "im", "i'm", "id", "i'd", "it", "its", "it's", "that", "this", "um", "uh", "hmm", "well", "so",
+    "yeah", "yes", "no", "nah", "ok", "okay", "honestly", "really", "just", "like", "maybe", "probably",
+    "pretty", "much", "say", "would", "guess", "think", "the", "a", "an", "to", "be", "been", "was", "is",
+    "am", "has", "have", "had", "for", "me", "my", "of", "kind", "sort", "over", "past", "last", "two",
+    "weeks", "couple"
+}
+# Filler words tolerated around a match before the answer counts as more than a frequency
+MAX_FILLER_WORDS = 3
+
+def normalize_answer(text):
+    """Lowercase, strip punctuation and collapse whitespace"""
+    text = text.lower().replace("’", "'")
+    text = re.sub(r"[^\w\s'/]", " ", text)
+    return " ".join(text.split())
+
+def load_scoring_rules(path=GAD7_PROTOCOL_PATH):
+    """Parse phrase -> score rules from the protocol's Scoring Interpretation Rules section"""
+    rules = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                match = RULE_PATTERN.match(line)
+                if not match:
+                    continue
+                score = int(match.group(2))
+                for phrase in QUOTED_PATTERN.findall(match.group(1)):
+                    rules[normalize_answer(phrase)] = score
+    except FileNotFoundError:
+        pass
+    return rules
+
+class LocalGAD7Scorer:
+    """Phrase-matching GAD-7 scorer that reports a confidence with each score"""
+
+    def __init__(self, rules=None):
+        self.phrases = {}
+        for score, phrases in SYNONYMS.items():
+            for phrase in phrases:
+                self.phrases[normalize_answer(phrase)] = score
+        # Protocol rules take precedence over the built-in synonyms
+        self.phrases.update(rules if rules is not None else load_scoring_rules())
+
+        # Longest phrases first so "not at all" wins over "not really"
+        ordered = sorted(self.phrases, key=len, reverse=True)
+        self.phrases.update(EXACT_ONLY_SYNONYMS)
+        self._pattern = re.compile(r"(?<![\w'])(" + "|".join(re.escape(p) for p in ordered) + r")(?![\w'])")
+
+    def classify(self, answer):
+        """Return (score, confidence) for an answer; score is None when nothing matched"""
+        normalized = normalize_answer(answer)
+        if not normalized:
+            return None, 0.0
+
+        if normalized in self.phrases:
+            return self.phrases[normalized], 1.0
+
+        matches = list(self._pattern.finditer(normalized))
+        if not matches:
+            return None, 0.0
+
+        scores = set()
+        for match in matches:
+            score = self.phrases[match.group(1)]
+            preceding = normalized[:match.start()].split()[-2:]
+            if score > 0 and any(word in NEGATIONS for word in preceding):
+                # "not often", "don't worry a lot" - too subtle for phrase matching
+                return score, 0.2
+            scores.add(score)
+
+        if len(scores) > 1:
+            # Conflicting signals, e.g. "sometimes, but lately all the time"
+            return max(scores), 0.3
+
+        # Only trust the phrase when it is (nearly) the whole answer
+        leftover = self._pattern.sub(" ", normalized).split()
+        if any(word not in FILLER_WORDS for word in leftover):
+            return scores.pop(), 0.4
+        if len(leftover) > MAX_FILLER_WORDS:
+            return scores.pop(), 0.6
+        return scores.pop(), 0.95
+
+class ScoringStats:
+    """Thread-safe counters of local hits vs. LLM fallbacks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.cache_hits = 0
+        self.llm_fallbacks = 0
+
+    def record(self, source):
+        """Count one scored answer by where its score came from ('local', 'cache' or 'llm')"""
+        with self._lock:
+            if source == 'local':
+                self.local_hits += 1
+            elif source == 'cache':
+                self.cache_hits += 1
+            else:
+                self.llm_fallbacks += 1
+
+    def summary(self):
+        """Return a dict with counts and the share of answers that needed no API call"""
+        with self._lock:
+            total = self.local_hits + self.cache_hits + self.llm_fallbacks
+            return {
+                'local_hits': self.local_hits,
+                'cache_hits': self.cache_hits,
+                'llm_fallbacks': self.llm_fallbacks,
+                'total': total,
+                'local_hit_rate': ((self.local_hits + self.cache_hits) / total) if total else 0.0
+            }
+
+scoring_stats = ScoringStats()
+
+_local_scorer = None
+_local_scorer_lock = threading.Lock()
+
+def get_local_scorer():
+    """Return the shared local scorer, building it from the protocol on first use"""
+    global _local_scorer
+    with _local_scorer_lock:
+        if _local_scorer is None:
+            _local_scorer = LocalGAD7Scorer()
+        return _local_scorer
+
+def scoring_fingerprint(model, *prompt_parts):
+    """Fingerprint the scoring model and prompt text; cached scores are only valid for a matching fingerprint"""
+    digest = hashlib.sha256(model.encode('utf-8'))
+    for part in prompt_parts:
+        digest.update(b'\0' + part.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+class ScoreCache:
+    """Normalized answer -> score cache with an in-process LRU over a shared SQLite store
+
+    Entries expire after ttl_seconds in both levels; the store is trimmed to
+    max_rows (oldest first) across all fingerprints when the cache is opened.
+    """
+
+    def __init__(self, fingerprint, path=SCORE_CACHE_PATH, max_memory_entries=1024,
+                 ttl_seconds=SCORE_CACHE_TTL_SECONDS, max_rows=SCORE_CACHE_MAX_ROWS):
+        self.fingerprint = fingerprint
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS gad7_scores (
+                    fingerprint TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (fingerprint, answer)
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS gad7_scores_created ON gad7_scores (created)")
+            # Other fingerprints may belong to processes running another prompt version,
+            # so entries are only removed by age and by the size cap
+            self._conn.execute("DELETE FROM gad7_scores WHERE created < ?", (time.time() - ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM gad7_scores WHERE rowid IN "
+                "(SELECT rowid FROM gad7_scores ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (max_rows,)
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Score cache unavailable, using in-memory cache only: {e}")
+            self._conn = None
+
+    def get(self, answer):
+        """Return the cached score for an answer, or None"""
+        key = normalize_answer(answer)
+        oldest = time.time() - self.ttl_seconds
+        with self._lock:
+            if key in self._memory:
+                score, created = self._memory[key]
+                if created >= oldest:
+                    self._memory.move_to_end(key)
+                    return score
+                del self._memory[key]
+
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT score, created FROM gad7_scores WHERE fingerprint = ? AND answer = ? AND created >= ?",
+                    (self.fingerprint, key, oldest)
+                ).fetchone()
+            except sqlite3.Error:
+                return None
+            if row is None:
+                return None
+            self._remember(key, row[0], row[1])
+            return row[0]
+
+    def put(self, answer, score):
+        """Store a score for an answer in both cache levels"""
+        key = normalize_answer(answer)
+        created = time.time()
+        with self._lock:
+            self._remember(key, score, created)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO gad7_scores (fingerprint, answer, score, created) VALUES (?, ?, ?, ?)",
+                    (self.fingerprint, key, score, created)
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                # Another process holds the write lock; the in-memory entry still helps
+                pass
+
+    def _remember(self, key, score, created):
+        """Insert into the LRU layer, evicting the least recently used entry when full"""
+        self._memory[key] = (score, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
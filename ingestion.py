@@ -0,0 +1,233 @@
+"""
+Ingestion Pipeline
+Streams protocol and tip documents into chunks for build_database.py, so
+memory is bounded by the pipeline's window sizes rather than by the size of
+the corpus:
+
+    iter_document_files -> iter_sections -> split_section (worker processes) -> iter_batches
+
+Files and directory trees are walked in sorted order and read lazily in
+paragraph-aligned sections. Sections are split into chunks on a pool of
+worker processes with at most max_in_flight sections read ahead of the
+consumer, so slow embedding or insertion holds back reading and chunking.
+Chunks come out in document order, so chunk ids are stable between runs.
+
+Chunking follows the Markdown structure of the protocol and tips files: each
+numbered question with its empathetic response, and each strategy bullet,
+becomes one chunk tagged with its symptom; remaining text is chunked per
+heading section. Only sections longer than chunk_size are split further.
+"""
+
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from protocol_index import GAD7_ITEM_COUNT, QUESTION_PATTERN, STRATEGY_PATTERN
+
+DEFAULT_DOCUMENT_PATHS = ('gad7_protocol.txt', 'cbt_tips.txt')
+# Documents the protocol index is compiled from, matched by file name; only
+# their chunks are tagged with symptoms
+PROTOCOL_DOCUMENTS = ('gad7_protocol', 'cbt_tips')
+DOCUMENT_EXTENSIONS = ('.txt', '.md')
+
+# Text handed to one worker at a time; small files are a single section
+SECTION_CHARS = 1_000_000
+CHUNK_SIZE = 1000
+# Only used when an oversized section has to be split by characters
+CHUNK_OVERLAP = 0
+CHUNK_SEPARATORS = ["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+
+# Markdown headings and all-caps "SECTION:" lines start a new section chunk
+HEADING_PATTERN = re.compile(r'^\s*(#{1,6}\s+\S.*|[A-Z][A-Z0-9 &/()\-]*:)\s*$')
+
+def document_name(relative_path):
+    """Source name of a document: its path without extension, e.g. 'tips/sleep'"""
+    return os.path.splitext(relative_path)[0].replace(os.sep, '/')
+
+def is_protocol_document(doc_name):
+    """Whether a document is one of PROTOCOL_DOCUMENTS, wherever it was found"""
+    return doc_name.rsplit('/', 1)[-1] in PROTOCOL_DOCUMENTS
+
+def iter_document_files(paths, extensions=DOCUMENT_EXTENSIONS):
+    """Yield (doc_name, path) for each file, walking directories in sorted order
+
+    Files given directly are named after their file name; files found under a
+    directory are named by their path relative to it. Hidden files and
+    directories are skipped.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield document_name(os.path.basename(path)), path
+            continue
+
+        for directory, subdirectories, file_names in os.walk(path):
+            subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+            for file_name in sorted(file_names):
+                if file_name.startswith('.') or not file_name.endswith(extensions):
+                    continue
+                file_path = os.path.join(directory, file_name)
+                yield document_name(os.path.relpath(file_path, path)), file_path
+
+def iter_sections(path, section_chars=SECTION_CHARS):
+    """Yield a file's text in pieces of about section_chars, cut at blank lines where possible"""
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = []
+        size = 0
+        for line in file:
+            lines.append(line)
+            size += len(line)
+            # Prefer paragraph boundaries, but never let one section grow without bound
+            if size >= section_chars and (not line.strip() or size >= 2 * section_chars):
+                yield ''.join(lines)
+                lines = []
+                size = 0
+        if lines:
+            yield ''.join(lines)
+
+def block_kind(line):
+    """Kind of block a line starts, or None if it doesn't start one"""
+    if QUESTION_PATTERN.match(line):
+        return 'question'
+    if STRATEGY_PATTERN.match(line):
+        return 'strategy'
+    if HEADING_PATTERN.match(line):
+        return 'section'
+    return None
+
+def iter_blocks(text):
+    """Yield (kind, lines) for each structural block of a section
+
+    kind is 'question' for a numbered question and its indented empathetic
+    response, 'strategy' for a strategy bullet, and 'section' for any other
+    text, grouped under the heading it follows. A blank line ends a question
+    or strategy block.
+    """
+    kind = None
+    lines = []
+
+    for line in text.split('\n'):
+        starts = block_kind(line)
+        if starts:
+            if lines:
+                yield kind, lines
+            kind = starts
+            lines = [line]
+        elif not line.strip():
+            if kind in ('question', 'strategy'):
+                yield kind, lines
+                kind = None
+                lines = []
+            elif lines:
+                lines.append(line)
+        elif kind in ('question', 'strategy') and not line[:1].isspace():
+            # An unindented line right after a block starts ordinary text
+            yield kind, lines
+            kind = 'section'
+            lines = [line]
+        else:
+            kind = kind or 'section'
+            lines.append(line)
+
+    if lines:
+        yield kind, lines
+
+_text_splitters = {}
+
+def split_oversized(text, chunk_size, chunk_overlap):
+    """Split text that doesn't fit in one chunk with RecursiveCharacterTextSplitter"""
+    splitter = _text_splitters.get((chunk_size, chunk_overlap))
+    if splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            separators=CHUNK_SEPARATORS
+        )
+        _text_splitters[(chunk_size, chunk_overlap)] = splitter
+    return splitter.split_text(text)
+
+def split_section(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Split one section into structural blocks; runs in a worker process
+
+    Returns a dict per block with 'kind' and 'parts' (its chunk texts: one,
+    unless the block is longer than chunk_size). Question blocks also carry
+    their 0-based 'symptom_index' and strategy blocks their 'symptom' label.
+    Headings on their own are dropped.
+    """
+    blocks = []
+    for kind, lines in iter_blocks(text):
+        content = '\n'.join(lines).strip()
+        if not content or (kind == 'section' and '\n' not in content and HEADING_PATTERN.match(content)):
+            continue
+
+        block = {'kind': kind}
+        if kind == 'question':
+            number = int(QUESTION_PATTERN.match(lines[0]).group(1))
+            if 1 <= number <= GAD7_ITEM_COUNT:
+                block['symptom_index'] = number - 1
+        elif kind == 'strategy':
+            block['symptom'] = STRATEGY_PATTERN.match(lines[0]).group(1).strip()
+
+        if len(content) <= chunk_size:
+            block['parts'] = [content]
+        else:
+            block['parts'] = split_oversized(content, chunk_size, chunk_overlap)
+        blocks.append(block)
+    return blocks
+
+def iter_chunks(document_files, workers=None, max_in_flight=None, section_chars=SECTION_CHARS,
+                chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Yield chunk dicts for (doc_name, path) pairs in document order
+
+    Each chunk has 'content', 'kind', 'source', 'chunk_id' and 'chunk_number'
+    (1-based within its document). Chunks of PROTOCOL_DOCUMENTS also carry
+    symptom metadata; strategy bullets are matched to symptoms by their order
+    in the document, as in the protocol index. Numbered lists and bullets in
+    other documents are left untagged so symptom lookups only find protocol text.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    chunk_counts = {}
+    strategy_counts = {}
+
+    def finish(doc_name, future):
+        tag_symptoms = is_protocol_document(doc_name)
+        for block in future.result():
+            parts = block.pop('parts')
+            if not tag_symptoms:
+                block.pop('symptom_index', None)
+                block.pop('symptom', None)
+            elif block['kind'] == 'strategy':
+                strategy_number = strategy_counts.get(doc_name, 0)
+                strategy_counts[doc_name] = strategy_number + 1
+                if strategy_number < GAD7_ITEM_COUNT:
+                    block['symptom_index'] = strategy_number
+            for content in parts:
+                chunk_number = chunk_counts.get(doc_name, 0) + 1
+                chunk_counts[doc_name] = chunk_number
+                yield dict(block, content=content, source=doc_name, chunk_id=f"{doc_name}_chunk_{chunk_number}",
+                           chunk_number=chunk_number)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for doc_name, path in document_files:
+            for section in iter_sections(path, section_chars):
+                pending.append((doc_name, executor.submit(split_section, section, chunk_size, chunk_overlap)))
+                # Only read further once the oldest section has been consumed
+                while len(pending) >= max_in_flight:
+                    yield from finish(*pending.popleft())
+        while pending:
+            yield from finish(*pending.popleft())
+
+def iter_batches(items, batch_size):
+    """Group an iterable into lists of up to batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
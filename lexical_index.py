@@ -0,0 +1,291 @@
+"""
+Lexical Index
+A BM25 inverted index over the individual lines of every stored chunk.
+
+build_database.py builds it from the same chunks it embeds and writes it next
+to the vector database; app.py loads it once and uses it to:
+
+- find protocol lines (questions, empathetic responses, strategies) by
+  keyword in well under a millisecond, instead of scanning whatever single
+  chunk a vector query returned,
+- answer exact-phrase lookups through posting-list intersection,
+- fuse lexical and vector rankings for search_knowledge_base(mode='hybrid')
+  with reciprocal rank fusion.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+
+LEXICAL_INDEX_PATH = './db/lexical_index.json'
+LEXICAL_INDEX_VERSION = 1
+
+# Lines indexed between flushes of the builder's postings to a segment file
+LEXICAL_SEGMENT_LINES = 50_000
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Reciprocal rank fusion constant; larger values flatten the contribution of top ranks
+RRF_K = 60
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'been', 'but', 'by', 'for', 'from', 'has', 'have', 'how', 'i',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'with', 'you', 'your'
+})
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class LexicalIndexBuilder:
+    """Accumulates chunks one at a time, so the index can be built from a stream
+
+    Every non-blank line is indexed as its own document and remembers its
+    chunk and position, so neighbouring lines can be looked up. Lines are
+    spooled to a temporary file as they are added, and postings are flushed
+    to a term-sorted segment file every segment_lines lines, so memory stays
+    bounded however large the corpus is; write() merges the segments into
+    the index file.
+    """
+
+    def __init__(self, segment_lines=LEXICAL_SEGMENT_LINES):
+        self.segment_lines = segment_lines
+        self.line_count = 0
+        self._lines = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._segments = []
+        self._postings = {}
+        self._segment_line_count = 0
+
+    def add(self, chunk):
+        """Index every non-blank line of a chunk dict with 'chunk_id' and 'content'"""
+        for line_number, line in enumerate(chunk['content'].split('\n')):
+            if not line.strip():
+                continue
+            line_index = self.line_count
+            terms = tokenize(line)
+            self._lines.write(json.dumps([chunk['chunk_id'], line_number, line.strip(), len(terms)],
+                                         ensure_ascii=False) + '\n')
+            self.line_count += 1
+            self._segment_line_count += 1
+
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                self._postings.setdefault(term, []).append([line_index, count])
+
+        if self._segment_line_count >= self.segment_lines:
+            self._flush_segment()
+
+    def _flush_segment(self):
+        """Write the in-memory postings to a new segment file, one term per line in term order"""
+        if not self._postings:
+            return
+        segment = tempfile.TemporaryFile('w+', encoding='utf-8')
+        for term in sorted(self._postings):
+            segment.write(json.dumps([term, self._postings[term]], ensure_ascii=False) + '\n')
+        self._segments.append(segment)
+        self._postings = {}
+        self._segment_line_count = 0
+
+    def _iter_lines(self):
+        """Yield [chunk_id, line_number, text, length] for every line in order"""
+        self._lines.flush()
+        self._lines.seek(0)
+        for record in self._lines:
+            yield json.loads(record)
+
+    def _iter_postings(self):
+        """Yield (term, entries) in term order, merging the segments
+
+        Segments cover consecutive line ranges and heapq.merge keeps equal
+        terms in segment order, so each merged posting list stays sorted.
+        """
+        self._flush_segment()
+        streams = []
+        for segment in self._segments:
+            segment.seek(0)
+            streams.append(json.loads(record) for record in segment)
+
+        term = None
+        entries = []
+        for next_term, segment_entries in heapq.merge(*streams, key=lambda item: item[0]):
+            if next_term != term:
+                if term is not None:
+                    yield term, entries
+                term = next_term
+                entries = []
+            entries.extend(segment_entries)
+        if term is not None:
+            yield term, entries
+
+    def build(self):
+        """Return the whole index as a dict, for small corpora; write() streams it to disk instead"""
+        lines = list(self._iter_lines())
+        return {'version': LEXICAL_INDEX_VERSION, 'lines': [line[:3] for line in lines],
+                'lengths': [line[3] for line in lines], 'postings': dict(self._iter_postings())}
+
+    def write(self, path=LEXICAL_INDEX_PATH):
+        """Atomically write the index as JSON, merging segments as it goes; returns the number of terms"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        def dump(value):
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+        term_count = 0
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(f'{{"version":{LEXICAL_INDEX_VERSION},"lines":[')
+            for line_index, line in enumerate(self._iter_lines()):
+                file.write((',' if line_index else '') + dump(line[:3]))
+            file.write('],"lengths":[')
+            for line_index, line in enumerate(self._iter_lines()):
+                file.write((',' if line_index else '') + str(line[3]))
+            file.write('],"postings":{')
+            for term, entries in self._iter_postings():
+                file.write((',' if term_count else '') + dump(term) + ':' + dump(entries))
+                term_count += 1
+            file.write('}}')
+        os.replace(temp_path, path)
+        return term_count
+
+    def close(self):
+        """Remove the temporary line and segment files"""
+        self._lines.close()
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked lists of ids into [(id, score)], best first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda entry: entry[1], reverse=True)
+
+class LexicalIndex:
+    """In-memory BM25 search over indexed chunk lines"""
+
+    def __init__(self, data):
+        self.lines = data['lines']
+        self.lengths = data['lengths']
+        self.postings = data['postings']
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        line_count = len(self.lines)
+        self.idf = {
+            term: math.log(1 + (line_count - len(entries) + 0.5) / (len(entries) + 0.5))
+            for term, entries in self.postings.items()
+        }
+
+    @classmethod
+    def load(cls, path=LEXICAL_INDEX_PATH):
+        """Load the index from disk, or return None if it is missing or from another version"""
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != LEXICAL_INDEX_VERSION:
+            return None
+        return cls(data)
+
+    def score_lines(self, query):
+        """Return {line_index: BM25 score} for lines sharing a term with query"""
+        scores = {}
+        for term in set(tokenize(query)):
+            entries = self.postings.get(term)
+            if not entries:
+                continue
+            idf = self.idf[term]
+            for line_index, count in entries:
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[line_index] / (self.average_length or 1)
+                scores[line_index] = scores.get(line_index, 0.0) + idf * count * (BM25_K1 + 1) / (
+                    count + BM25_K1 * length_norm)
+        return scores
+
+    def search_lines(self, query, n_results=5, require=None):
+        """Return [(line_index, score)] best first; require keeps only lines containing that substring"""
+        ranked = sorted(self.score_lines(query).items(), key=lambda entry: entry[1], reverse=True)
+        if require:
+            ranked = [entry for entry in ranked if require in self.lines[entry[0]][2]]
+        return ranked[:n_results]
+
+    def best_line(self, query, require=None):
+        """Return the best matching line index, or None"""
+        ranked = self.search_lines(query, 1, require)
+        return ranked[0][0] if ranked else None
+
+    def search_chunks(self, query, n_results=3):
+        """Rank chunks by their best-matching line; returns [(chunk_id, score)]"""
+        best = {}
+        for line_index, score in self.score_lines(query).items():
+            chunk_id = self.lines[line_index][0]
+            if score > best.get(chunk_id, 0.0):
+                best[chunk_id] = score
+        return sorted(best.items(), key=lambda entry: entry[1], reverse=True)[:n_results]
+
+    def find_phrase(self, phrase, require=None):
+        """Return indexes of lines containing phrase (case-insensitive), via posting-list intersection
+
+        require keeps only lines that also contain that substring.
+
+        >>> builder = LexicalIndexBuilder()
+        >>> builder.add({'chunk_id': 'tips_chunk_1', 'content': "- **Strategy for trouble relaxing:** Breathe.\\n"
+        ...              "- **Strategy for restlessness:** Take a walk."})
+        >>> index = LexicalIndex(builder.build())
+        >>> index.find_phrase("strategy for RESTLESSNESS")
+        [1]
+        >>> index.find_phrase("trouble relaxing", require="Question:")
+        []
+        >>> index.find_phrase("restlessness trouble")
+        []
+        """
+        needle = phrase.lower()
+        terms = set(tokenize(phrase))
+        if terms:
+            candidates = None
+            for term in terms:
+                lines = {line_index for line_index, _ in self.postings.get(term, ())}
+                candidates = lines if candidates is None else candidates & lines
+                if not candidates:
+                    return []
+        else:
+            candidates = range(len(self.lines))
+        return sorted(line_index for line_index in candidates
+                      if needle in self.lines[line_index][2].lower()
+                      and (not require or require in self.lines[line_index][2]))
+
+    def line_text(self, line_index):
+        return self.lines[line_index][2]
+
+    def following_line(self, line_index, require):
+        """Return the first later line of the same chunk containing require, or None"""
+        chunk_id = self.lines[line_index][0]
+        for next_index in range(line_index + 1, len(self.lines)):
+            if self.lines[next_index][0] != chunk_id:
+                break
+            if require in self.lines[next_index][2]:
+                return next_index
+        return None
+
+_lexical_index = None
+_lexical_index_loaded = False
+_lexical_index_lock = threading.Lock()
+
+def get_lexical_index():
+    """Return the shared lexical index, loading it on first use; None if it hasn't been built"""
+    global _lexical_index, _lexical_index_loaded
+    with _lexical_index_lock:
+        if not _lexical_index_loaded:
+            _lexical_index = LexicalIndex.load()
+            _lexical_index_loaded = True
+        return _lexical_index
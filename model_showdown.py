@@ -1,35 +1,91 @@
+import argparse
+import csv
+import json
 import os
-from openai import OpenAI
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 
+from openai_transport import ResilientOpenAIClient, RetryPolicy, get_openai_client
+
 # Load environment variables
 load_dotenv('EXACTLY.env')
 
-# Set up OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Set up the shared OpenAI client (pooled connections, timeouts, retry backoff)
+client = get_openai_client(os.getenv('OPENAI_API_KEY'))
+# Benchmarks share its connection pool but never retry, so failures count as errors
+# and every latency sample is a single attempt
+benchmark_client = ResilientOpenAIClient(client.raw, RetryPolicy(max_retries=0))
+
+# Define the models to test
+MODELS = [
+    "gpt-3.5-turbo",
+    "gpt-4",
+    "gpt-4-turbo-preview"
+]
+
+# Define the prompts to test
+PROMPTS = [
+    "Write a haiku about artificial intelligence.",
+    "Explain quantum computing in simple terms.",
+    "What would be the best pizza topping combination and why?",
+    "Write a short story about a robot learning to paint.",
+    "What's the most underrated invention of the 20th century?"
+]
 
-def run_model_showdown():
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_MAX_PER_MODEL = 4
+
+def run_prompt(model, prompt, model_slots):
+    """Send one prompt to one model and return the formatted result text"""
+    with model_slots[model]:
+        try:
+            # Send request to OpenAI API using new format
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=500,
+                temperature=0.7
+            )
+            
+            # Extract the response content
+            response_content = response.choices[0].message.content
+            
+            # Format the response with some metadata
+            return (f"RESPONSE:\n{response_content}\n"
+                    f"\nTokens used: {response.usage.total_tokens}\n"
+                    f"Model: {response.model}\n")
+            
+        except Exception as e:
+            return f"ERROR: {str(e)}\n"
+
+def run_model_showdown(max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_per_model=DEFAULT_MAX_PER_MODEL):
     """
     Run a showdown between different OpenAI models using various prompts.
     Save all responses to a text file with clear labeling.
+    
+    All model/prompt pairs run concurrently, with at most max_in_flight
+    requests overall and max_per_model per model. Results are written in
+    model/prompt order regardless of completion order.
     """
     
-    # Define the models to test
-    models = [
-        "gpt-3.5-turbo",
-        "gpt-4",
-        "gpt-4-turbo-preview"
-    ]
+    models = MODELS
+    prompts = PROMPTS
     
-    # Define the prompts to test
-    prompts = [
-        "Write a haiku about artificial intelligence.",
-        "Explain quantum computing in simple terms.",
-        "What would be the best pizza topping combination and why?",
-        "Write a short story about a robot learning to paint.",
-        "What's the most underrated invention of the 20th century?"
-    ]
+    # Run every model/prompt pair concurrently
+    model_slots = {model: threading.BoundedSemaphore(max_per_model) for model in models}
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {
+            (model, i): executor.submit(run_prompt, model, prompt, model_slots)
+            for model in models
+            for i, prompt in enumerate(prompts, 1)
+        }
+        results = {key: future.result() for key, future in futures.items()}
     
     # Create results file
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -48,31 +104,7 @@ def run_model_showdown():
             for i, prompt in enumerate(prompts, 1):
                 f.write(f"PROMPT {i}: {prompt}\n")
                 f.write("-" * 20 + "\n")
-                
-                try:
-                    # Send request to OpenAI API using new format
-                    response = client.chat.completions.create(
-                        model=model,
-                        messages=[
-                            {"role": "user", "content": prompt}
-                        ],
-                        max_tokens=500,
-                        temperature=0.7
-                    )
-                    
-                    # Extract the response content
-                    response_content = response.choices[0].message.content
-                    
-                    # Write the response to file
-                    f.write(f"RESPONSE:\n{response_content}\n")
-                    
-                    # Add some metadata
-                    f.write(f"\nTokens used: {response.usage.total_tokens}\n")
-                    f.write(f"Model: {response.model}\n")
-                    
-                except Exception as e:
-                    f.write(f"ERROR: {str(e)}\n")
-                
+                f.write(results[(model, i)])
                 f.write("\n" + "=" * 40 + "\n\n")
             
             f.write("\n" + "=" * 50 + "\n\n")
@@ -80,10 +112,228 @@ def run_model_showdown():
     print(f"Model showdown completed! Results saved to 'model_showdown_results.txt'")
     print(f"Tested {len(models)} models with {len(prompts)} prompts each.")
 
+DEFAULT_TRIALS = 5
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+PERCENTILES = (50, 90, 99)
+
+def percentile(values, pct):
+    """Linearly interpolated percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def run_benchmark_trial(model, prompt_index, trial, model_slots, max_tokens=500):
+    """Stream one completion and measure wall latency, time to first token and output rate"""
+    sample = {
+        'model': model,
+        'prompt_index': prompt_index,
+        'trial': trial,
+        'ok': False,
+        'latency': None,
+        'ttft': None,
+        'output_tokens': None,
+        'tokens_per_second': None,
+        'error': None
+    }
+    
+    with model_slots[model]:
+        start_time = time.perf_counter()
+        first_token_time = None
+        output_tokens = None
+        chunk_count = 0
+        try:
+            stream = benchmark_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": PROMPTS[prompt_index - 1]}],
+                max_tokens=max_tokens,
+                temperature=0.7,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for chunk in stream:
+                if getattr(chunk, 'usage', None):
+                    output_tokens = chunk.usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunk_count += 1
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+            end_time = time.perf_counter()
+        except Exception as e:
+            sample['error'] = str(e)
+            sample['latency'] = time.perf_counter() - start_time
+            return sample
+    
+    # Fall back to counting content chunks if the API didn't report usage
+    output_tokens = output_tokens if output_tokens is not None else chunk_count
+    first_token_time = first_token_time or end_time
+    generation_time = end_time - first_token_time
+    
+    sample.update({
+        'ok': True,
+        'latency': end_time - start_time,
+        'ttft': first_token_time - start_time,
+        'output_tokens': output_tokens,
+        'tokens_per_second': (output_tokens / generation_time) if generation_time > 0 else None
+    })
+    return sample
+
+def summarize_samples(samples):
+    """Summarize a group of samples as percentiles, mean throughput and error rate"""
+    ok_samples = [sample for sample in samples if sample['ok']]
+    summary = {
+        'trials': len(samples),
+        'errors': len(samples) - len(ok_samples),
+        'error_rate': (len(samples) - len(ok_samples)) / len(samples) if samples else 0.0
+    }
+    for metric in ('latency', 'ttft', 'tokens_per_second'):
+        values = [sample[metric] for sample in ok_samples if sample[metric] is not None]
+        for pct in PERCENTILES:
+            summary[f'{metric}_p{pct}'] = percentile(values, pct)
+    return summary
+
+def build_benchmark_summaries(samples):
+    """Per (model, prompt) and per-model summaries in deterministic order"""
+    summaries = []
+    for model in MODELS:
+        model_samples = [sample for sample in samples if sample['model'] == model]
+        for prompt_index in range(1, len(PROMPTS) + 1):
+            group = [sample for sample in model_samples if sample['prompt_index'] == prompt_index]
+            summaries.append({'model': model, 'prompt_index': prompt_index, **summarize_samples(group)})
+        summaries.append({'model': model, 'prompt_index': 'all', **summarize_samples(model_samples)})
+    return summaries
+
+def write_benchmark_csv(summaries, csv_path):
+    """Write the summary rows as CSV"""
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(summaries[0].keys()))
+        writer.writeheader()
+        writer.writerows(summaries)
+
+def compare_benchmarks(summaries, previous_path, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Compare summaries with a previous JSON run; returns a list of regression descriptions
+
+    A regression is a p50/p90 latency or time to first token more than
+    threshold (as a fraction) slower than before, p50 throughput more than
+    threshold lower, or a higher error rate.
+    """
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    previous_by_key = {(row['model'], str(row['prompt_index'])): row for row in previous['summaries']}
+    
+    regressions = []
+    for row in summaries:
+        old = previous_by_key.get((row['model'], str(row['prompt_index'])))
+        if not old:
+            continue
+        label = f"{row['model']} prompt {row['prompt_index']}"
+        
+        for metric in ('latency_p50', 'latency_p90', 'ttft_p50', 'ttft_p90'):
+            if row.get(metric) and old.get(metric) and row[metric] > old[metric] * (1 + threshold):
+                regressions.append(f"{label}: {metric} {old[metric]:.2f}s -> {row[metric]:.2f}s")
+        
+        if (row.get('tokens_per_second_p50') and old.get('tokens_per_second_p50')
+                and row['tokens_per_second_p50'] < old['tokens_per_second_p50'] * (1 - threshold)):
+            regressions.append(f"{label}: tokens_per_second_p50 "
+                               f"{old['tokens_per_second_p50']:.1f} -> {row['tokens_per_second_p50']:.1f}")
+        
+        if row['error_rate'] > old.get('error_rate', 0):
+            regressions.append(f"{label}: error_rate {old.get('error_rate', 0):.0%} -> {row['error_rate']:.0%}")
+    
+    return regressions
+
+def run_benchmark(trials=DEFAULT_TRIALS, max_in_flight=DEFAULT_MAX_IN_FLIGHT, max_per_model=DEFAULT_MAX_PER_MODEL,
+                  json_path='model_benchmark_results.json', csv_path=None, compare_path=None,
+                  threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    Benchmark every model/prompt pair over repeated trials.
+    
+    Records wall latency, time to first token, output tokens per second and
+    errors per trial, prints p50/p90/p99 summaries per model and writes them
+    (with raw samples) to json_path and optionally csv_path. If compare_path
+    points at a previous JSON run, regressions beyond threshold are flagged.
+    Returns the list of regressions.
+    """
+    model_slots = {model: threading.BoundedSemaphore(max_per_model) for model in MODELS}
+    jobs = [
+        (model, prompt_index, trial)
+        for trial in range(1, trials + 1)
+        for model in MODELS
+        for prompt_index in range(1, len(PROMPTS) + 1)
+    ]
+    
+    print(f"⏱️  Benchmarking {len(MODELS)} models x {len(PROMPTS)} prompts x {trials} trials "
+          f"({len(jobs)} requests, {max_in_flight} in flight)...")
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        samples = list(executor.map(lambda job: run_benchmark_trial(*job, model_slots), jobs))
+    
+    summaries = build_benchmark_summaries(samples)
+    
+    print(f"\n{'MODEL':<22}{'p50 lat':>9}{'p90 lat':>9}{'p99 lat':>9}{'p50 ttft':>10}{'p90 ttft':>10}{'tok/s':>10}{'errors':>8}")
+    for row in summaries:
+        if row['prompt_index'] != 'all':
+            continue
+        cells = [row['latency_p50'], row['latency_p90'], row['latency_p99'], row['ttft_p50'], row['ttft_p90']]
+        formatted = [f"{value:.2f}s" if value is not None else "-" for value in cells]
+        tokens_per_second = f"{row['tokens_per_second_p50']:.1f}" if row['tokens_per_second_p50'] else "-"
+        print(f"{row['model']:<22}{formatted[0]:>9}{formatted[1]:>9}{formatted[2]:>9}"
+              f"{formatted[3]:>10}{formatted[4]:>10}{tokens_per_second:>10}{row['error_rate']:>8.0%}")
+    
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'generated_on': datetime.now().isoformat(timespec='seconds'),
+            'trials': trials,
+            'models': MODELS,
+            'prompts': PROMPTS,
+            'summaries': summaries,
+            'samples': samples
+        }, f, indent=2)
+    print(f"\n📄 Benchmark results saved to '{json_path}'")
+    
+    if csv_path:
+        write_benchmark_csv(summaries, csv_path)
+        print(f"📄 Summary CSV saved to '{csv_path}'")
+    
+    regressions = []
+    if compare_path:
+        regressions = compare_benchmarks(summaries, compare_path, threshold)
+        if regressions:
+            print(f"\n⚠️  {len(regressions)} regressions vs '{compare_path}' (threshold {threshold:.0%}):")
+            for regression in regressions:
+                print(f"   - {regression}")
+        else:
+            print(f"\n✓ No regressions vs '{compare_path}'")
+    
+    return regressions
+
 if __name__ == "__main__":
     # Check if API key is available
     if not os.getenv('OPENAI_API_KEY'):
         print("Error: OPENAI_API_KEY not found in environment variables.")
         print("Please make sure your .env file contains the API key.")
     else:
-        run_model_showdown() 
\ No newline at end of file
+        parser = argparse.ArgumentParser(description="Compare OpenAI models on a set of prompts")
+        parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                            help="maximum concurrent requests overall")
+        parser.add_argument("--max-per-model", type=int, default=DEFAULT_MAX_PER_MODEL,
+                            help="maximum concurrent requests per model")
+        parser.add_argument("--benchmark", action="store_true",
+                            help="measure latency/throughput over repeated trials instead of saving responses")
+        parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS, help="trials per model/prompt pair")
+        parser.add_argument("--json", default="model_benchmark_results.json", help="benchmark JSON output path")
+        parser.add_argument("--csv", help="optional benchmark summary CSV output path")
+        parser.add_argument("--compare", help="previous benchmark JSON to check for regressions")
+        parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                            help="relative slowdown that counts as a regression (default 0.2)")
+        args = parser.parse_args()
+        
+        if args.benchmark:
+            regressions = run_benchmark(args.trials, args.max_in_flight, args.max_per_model,
+                                        args.json, args.csv, args.compare, args.threshold)
+            if regressions:
+                sys.exit(1)
+        else:
+            run_model_showdown(args.max_in_flight, args.max_per_model) 
\ No newline at end of file
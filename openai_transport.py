@@ -0,0 +1,195 @@
+"""
+OpenAI Transport
+One shared, pooled OpenAI client for app.py, build_database.py,
+model_showdown.py and server.py.
+
+- A single httpx connection pool with keep-alive is reused by every call in the process.
+- Each request gets a per-attempt timeout, and each call has an overall deadline across retries.
+- Transient failures (timeouts, connection errors, 408/409/429/5xx) are retried
+  with jittered exponential backoff that honours Retry-After headers.
+
+get_openai_client() returns a wrapper exposing the same
+chat.completions.create / embeddings.create interface as openai.OpenAI, so
+existing call sites work unchanged.
+
+httpx and the openai SDK are imported on first use rather than at import
+time, so scripts that import this module start quickly.
+"""
+
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from cassette import create_cassette_client, get_cassette_mode
+from tracing import span
+
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv('OPENAI_REQUEST_TIMEOUT', '30'))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '5'))
+DEFAULT_DEADLINE = float(os.getenv('OPENAI_DEADLINE', '90'))
+DEFAULT_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '4'))
+DEFAULT_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '32'))
+
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+class RetryPolicy:
+    """Timeouts, deadline and backoff settings for OpenAI calls"""
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES, request_timeout=DEFAULT_REQUEST_TIMEOUT,
+                 deadline=DEFAULT_DEADLINE, base_delay=BACKOFF_BASE_SECONDS, max_delay=BACKOFF_MAX_SECONDS):
+        self.max_retries = max_retries
+        self.request_timeout = request_timeout
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+def is_retryable(error):
+    """Return True for errors worth retrying"""
+    import openai
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+def get_retry_after(error):
+    """Return the server-requested retry delay in seconds, or None"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    import email.utils
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, policy, error=None):
+    """Full-jitter exponential backoff, overridden by a Retry-After header when present"""
+    retry_after = get_retry_after(error) if error is not None else None
+    if retry_after is not None:
+        return min(retry_after, policy.max_delay)
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+
+def call_with_backoff(request, policy, deadline=None, on_retry=None):
+    """Call request(timeout=...) with retries, giving up once the overall deadline is spent
+
+    Each attempt's timeout is capped by the time left before the deadline, so
+    a call never runs much past deadline seconds in total. on_retry, if given,
+    is called with the number of retries made so far.
+    """
+    deadline_at = time.monotonic() + (deadline if deadline is not None else policy.deadline)
+    attempt = 0
+
+    while True:
+        remaining = deadline_at - time.monotonic()
+        try:
+            return request(timeout=max(0.1, min(policy.request_timeout, remaining)))
+        except Exception as e:
+            if attempt >= policy.max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, policy, e)
+            if time.monotonic() + delay >= deadline_at:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            if on_retry:
+                on_retry(attempt)
+
+def record_usage(current_span, response):
+    """Copy token usage from a non-streaming response onto a tracing span"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    current_span.set(
+        prompt_tokens=getattr(usage, 'prompt_tokens', None),
+        completion_tokens=getattr(usage, 'completion_tokens', None) or 0
+    )
+
+class _RetryingEndpoint:
+    """Wraps an SDK create() method with the retry policy and a tracing span"""
+
+    def __init__(self, create, policy, name):
+        self._create = create
+        self._policy = policy
+        self._name = name
+
+    def create(self, deadline=None, **kwargs):
+        with span(f"openai.{self._name}", model=kwargs.get('model'), stream=bool(kwargs.get('stream'))) as current:
+            response = call_with_backoff(lambda timeout: self._create(timeout=timeout, **kwargs), self._policy,
+                                         deadline, on_retry=lambda retries: current.set(retries=retries))
+            # Streams are timed up to the response headers; callers trace the token stream itself
+            if not kwargs.get('stream'):
+                record_usage(current, response)
+            return response
+
+class ResilientOpenAIClient:
+    """openai.OpenAI look-alike whose create() calls retry with backoff within a deadline"""
+
+    def __init__(self, client, policy=None):
+        self.raw = client
+        self.policy = policy or RetryPolicy()
+        self.chat = SimpleNamespace(completions=_RetryingEndpoint(client.chat.completions.create, self.policy,
+                                                                  'chat.completions'))
+        self.embeddings = _RetryingEndpoint(client.embeddings.create, self.policy, 'embeddings')
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def create_http_client(max_connections=DEFAULT_MAX_CONNECTIONS):
+    """Create the pooled keep-alive HTTP client shared by OpenAI calls"""
+    import httpx
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60
+        ),
+        timeout=httpx.Timeout(DEFAULT_REQUEST_TIMEOUT, connect=DEFAULT_CONNECT_TIMEOUT)
+    )
+
+def get_openai_client(api_key=None, policy=None):
+    """Return the process-wide shared OpenAI client for api_key, creating it on first use
+
+    When OPENAI_CASSETTE_MODE is set, calls are recorded to or replayed from
+    a local cassette (see cassette.py); replay never touches the network.
+    """
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            cassette_mode = get_cassette_mode()
+            if cassette_mode == 'replay':
+                raw_client = create_cassette_client('replay')
+            else:
+                import openai
+                raw_client = openai.OpenAI(
+                    api_key=api_key,
+                    http_client=create_http_client(),
+                    # Retries are handled by call_with_backoff so the deadline covers them
+                    max_retries=0
+                )
+                if cassette_mode == 'record':
+                    raw_client = create_cassette_client('record', raw_client)
+            client = ResilientOpenAIClient(raw_client, policy)
+            _clients[api_key] = client
+        return client
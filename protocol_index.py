@@ -0,0 +1,103 @@
+"""
+Protocol Index
+A compact, precompiled index of the GAD-7 questions, empathetic responses and
+CBT strategies, keyed by symptom index 0-6.
+
+build_database.py parses gad7_protocol.txt and cbt_tips.txt and writes the
+index next to the vector database; app.py loads it once at startup and looks
+items up directly instead of running a vector query and scanning the
+returned chunk line by line.
+"""
+
+import json
+import os
+import re
+
+PROTOCOL_INDEX_PATH = './db/protocol_index.json'
+PROTOCOL_INDEX_VERSION = 1
+GAD7_ITEM_COUNT = 7
+
+QUESTION_PATTERN = re.compile(r'^\s*(\d+)\.\s+\*\*Question:\*\*\s*"(.+)"\s*$')
+EMPATHY_PATTERN = re.compile(r'^\s*\*\*Empathetic Response[^*]*:\*\*\s*"(.+)"\s*$')
+STRATEGY_PATTERN = re.compile(r'^\s*-\s+\*\*Strategy for ([^:*]+):\*\*\s*(.+)$')
+
+def parse_gad7_protocol(text):
+    """Extract (question, empathetic_response) pairs in question order"""
+    items = {}
+    current = None
+
+    for line in text.split('\n'):
+        question_match = QUESTION_PATTERN.match(line)
+        if question_match:
+            current = int(question_match.group(1))
+            items[current] = {'question': question_match.group(2), 'empathetic_response': None}
+            continue
+
+        empathy_match = EMPATHY_PATTERN.match(line)
+        if empathy_match and current is not None:
+            items[current]['empathetic_response'] = empathy_match.group(1)
+
+    return [items[number] for number in sorted(items)]
+
+def parse_cbt_strategies(text):
+    """Extract strategy bullets in document order as dicts with label and line"""
+    strategies = []
+    for line in text.split('\n'):
+        match = STRATEGY_PATTERN.match(line)
+        if match:
+            strategies.append({'label': match.group(1).strip(), 'strategy': line.strip()})
+    return strategies
+
+def build_protocol_index(documents):
+    """Build the symptom-indexed protocol index from loaded documents
+
+    Returns None if the documents don't contain exactly one question,
+    empathetic response and strategy per GAD-7 item.
+    """
+    questions = parse_gad7_protocol(documents.get('gad7_protocol', ''))
+    strategies = parse_cbt_strategies(documents.get('cbt_tips', ''))
+
+    if len(questions) != GAD7_ITEM_COUNT or len(strategies) != GAD7_ITEM_COUNT:
+        return None
+    if any(not item['empathetic_response'] for item in questions):
+        return None
+
+    symptoms = []
+    for index, (item, strategy) in enumerate(zip(questions, strategies)):
+        symptoms.append({
+            'index': index,
+            'question': item['question'],
+            'empathetic_response': item['empathetic_response'],
+            'strategy_label': strategy['label'],
+            'strategy': strategy['strategy']
+        })
+
+    return {'version': PROTOCOL_INDEX_VERSION, 'symptoms': symptoms}
+
+def write_protocol_index(index, path=PROTOCOL_INDEX_PATH):
+    """Atomically write the protocol index as JSON"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+def load_protocol_index(path=PROTOCOL_INDEX_PATH):
+    """Load the protocol index as a list of per-symptom dicts, or None if unavailable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            index = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if index.get('version') != PROTOCOL_INDEX_VERSION:
+        return None
+
+    symptoms = index.get('symptoms', [])
+    if len(symptoms) != GAD7_ITEM_COUNT:
+        return None
+
+    return symptoms
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Check-in Server
+A multi-session HTTP backend for the web front-end (web_index.html / web_app.js)
+built around the same stage helpers as the terminal chatbot in app.py.
+
+All sessions share one ChromaDB collection, one OpenAI client (whose HTTP
+connection pool is thread-safe) and the precompiled protocol index. Per-session
+state lives in memory and is evicted after a period of inactivity. The number
+of requests processed at once is capped; extra requests wait briefly and then
+get HTTP 503.
+
+Endpoints (JSON):
+    GET  /api/health
+    GET  /api/questions
+    POST /api/sessions                      -> {"session_id", "questions"}
+    POST /api/sessions/<id>/journal         {"text"}
+    POST /api/sessions/<id>/answers         {"answer"} -> score, empathetic response, next question
+    POST /api/sessions/<id>/assessment      {"answers": [7]} -> all scores scored in one request
+    POST /api/sessions/<id>/support         -> severity, strategy and personalized summary
+
+Run with: python server.py --port 8000
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app import (GAD7_QUESTION_TOPICS, generate_personalized_summary, get_gad7_score, get_gad7_scores,
+                 get_highest_scoring_symptom, initialize_resources, interpret_gad7_score, retrieve_cbt_strategy,
+                 retrieve_empathetic_response, retrieve_question_text)
+
+DEFAULT_MAX_CONCURRENT_REQUESTS = 16
+DEFAULT_SESSION_IDLE_TIMEOUT = 30 * 60
+DEFAULT_MAX_SESSIONS = 1000
+
+# How long a request may wait for a free slot before getting 503
+CONCURRENCY_WAIT_SECONDS = 5
+MAX_REQUEST_BYTES = 64 * 1024
+
+STATIC_FILES = {
+    '/': ('web_index.html', 'text/html; charset=utf-8'),
+    '/web_index.html': ('web_index.html', 'text/html; charset=utf-8'),
+    '/web_app.js': ('web_app.js', 'application/javascript; charset=utf-8'),
+    '/web_style.css': ('web_style.css', 'text/css; charset=utf-8')
+}
+
+SESSION_ROUTE = re.compile(r'^/api/sessions/([0-9a-f]{32})/(journal|answers|assessment|support)$')
+
+class ApiError(Exception):
+    """An error reported to the client with an HTTP status code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+class CheckinSession:
+    """In-memory state of one user's check-in"""
+
+    def __init__(self):
+        self.session_id = uuid.uuid4().hex
+        self.journal_entry = "User chose not to write much today."
+        self.scores = []
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+
+class SessionStore:
+    """Thread-safe session registry with idle eviction"""
+
+    def __init__(self, idle_timeout=DEFAULT_SESSION_IDLE_TIMEOUT, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self):
+        """Create and register a new session"""
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                self._evict_idle_locked()
+            if len(self._sessions) >= self.max_sessions:
+                raise ApiError(503, "Too many active sessions, please try again later")
+            session = CheckinSession()
+            self._sessions[session.session_id] = session
+            return session
+
+    def get(self, session_id):
+        """Return a session and mark it as active"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise ApiError(404, "Unknown or expired session")
+            session.last_seen = time.monotonic()
+            return session
+
+    def evict_idle(self):
+        """Drop sessions idle for longer than idle_timeout; returns how many were evicted"""
+        with self._lock:
+            return self._evict_idle_locked()
+
+    def _evict_idle_locked(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = [session_id for session_id, session in self._sessions.items() if session.last_seen < cutoff]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return len(expired)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def start_reaper(self, interval=60):
+        """Evict idle sessions periodically on a daemon thread"""
+        def reap():
+            while True:
+                time.sleep(interval)
+                evicted = self.evict_idle()
+                if evicted:
+                    print(f"🧹 Evicted {evicted} idle sessions ({len(self)} active)")
+
+        thread = threading.Thread(target=reap, name="session-reaper", daemon=True)
+        thread.start()
+        return thread
+
+class CheckinService:
+    """Stage 1-3 logic for web sessions, sharing one set of resources across sessions"""
+
+    def __init__(self, collection, openai_client, embedding_backend, protocol_index, sessions):
+        self.collection = collection
+        self.openai_client = openai_client
+        self.embedding_backend = embedding_backend
+        self.protocol_index = protocol_index
+        self.sessions = sessions
+
+        # Questions and empathetic responses are the same for every session
+        self.questions = [
+            retrieve_question_text(collection, embedding_backend, topic, protocol_index, index)
+            for index, topic in enumerate(GAD7_QUESTION_TOPICS)
+        ]
+        self.empathetic_responses = [
+            retrieve_empathetic_response(collection, embedding_backend, topic, protocol_index, index)
+            for index, topic in enumerate(GAD7_QUESTION_TOPICS)
+        ]
+
+    def start_session(self):
+        session = self.sessions.create()
+        return {'session_id': session.session_id, 'questions': self.questions}
+
+    def submit_journal(self, session, payload):
+        text = str(payload.get('text', '')).strip()
+        with session.lock:
+            if text:
+                session.journal_entry = text
+        return {'ok': True}
+
+    def submit_answer(self, session, payload):
+        answer = str(payload.get('answer', '')).strip() or "no response"
+        with session.lock:
+            question_index = len(session.scores)
+            if question_index >= len(GAD7_QUESTION_TOPICS):
+                raise ApiError(409, "All questions have already been answered")
+
+            score = get_gad7_score(self.openai_client, answer)
+            session.scores.append(score)
+
+            complete = len(session.scores) == len(GAD7_QUESTION_TOPICS)
+            result = {
+                'question_index': question_index,
+                'score': score,
+                'empathetic_response': self.empathetic_responses[question_index] if score >= 2 else None,
+                'next_question': None if complete else self.questions[question_index + 1],
+                'complete': complete
+            }
+            if complete:
+                total_score = sum(session.scores)
+                severity, emoji = interpret_gad7_score(total_score)
+                result.update({'total_score': total_score, 'severity': severity, 'emoji': emoji})
+            return result
+
+    def submit_assessment(self, session, payload):
+        answers = payload.get('answers')
+        if not isinstance(answers, list) or len(answers) != len(GAD7_QUESTION_TOPICS):
+            raise ApiError(400, f"answers must be a list of {len(GAD7_QUESTION_TOPICS)} strings")
+        answers = [str(answer).strip() or "no response" for answer in answers]
+
+        with session.lock:
+            if session.scores:
+                raise ApiError(409, "Questions have already been answered in this session")
+
+            scores = get_gad7_scores(self.openai_client, answers)
+            session.scores = scores
+
+            total_score = sum(scores)
+            severity, emoji = interpret_gad7_score(total_score)
+            return {
+                'scores': scores,
+                'empathetic_responses': [
+                    self.empathetic_responses[index] if score >= 2 else None for index, score in enumerate(scores)
+                ],
+                'complete': True,
+                'total_score': total_score,
+                'severity': severity,
+                'emoji': emoji
+            }
+
+    def support(self, session, payload):
+        with session.lock:
+            if len(session.scores) < len(GAD7_QUESTION_TOPICS):
+                raise ApiError(409, "Finish the assessment before requesting support")
+            scores = list(session.scores)
+            journal_entry = session.journal_entry
+
+        total_score = sum(scores)
+        highest_symptom, highest_score = get_highest_scoring_symptom(scores)
+        strategy = retrieve_cbt_strategy(self.collection, self.embedding_backend, highest_symptom,
+                                         self.protocol_index, scores.index(highest_score))
+        summary = generate_personalized_summary(self.openai_client, journal_entry, scores, total_score, strategy)
+        severity, emoji = interpret_gad7_score(total_score)
+
+        return {
+            'total_score': total_score,
+            'severity': severity,
+            'emoji': emoji,
+            'highest_symptom': highest_symptom,
+            'highest_score': highest_score,
+            'strategy': strategy,
+            'summary': summary
+        }
+
+def make_handler(service, max_concurrent):
+    """Build a request handler class bound to a service and a concurrency limit"""
+    slots = threading.BoundedSemaphore(max_concurrent)
+    session_actions = {
+        'journal': service.submit_journal,
+        'answers': service.submit_answer,
+        'assessment': service.submit_assessment,
+        'support': service.support
+    }
+
+    class CheckinRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == '/api/health':
+                self.send_json(200, {'status': 'ok', 'active_sessions': len(service.sessions)})
+            elif self.path == '/api/questions':
+                self.send_json(200, {'questions': service.questions})
+            elif self.path in STATIC_FILES:
+                self.send_static(*STATIC_FILES[self.path])
+            else:
+                self.send_json(404, {'error': 'Not found'})
+
+        def do_POST(self):
+            # Consume the body before anything can fail, so a keep-alive connection
+            # never has leftover body bytes parsed as the next request
+            try:
+                payload = self.read_json()
+            except ApiError as e:
+                self.send_json(e.status, {'error': e.message})
+                return
+            
+            if not slots.acquire(timeout=CONCURRENCY_WAIT_SECONDS):
+                self.send_json(503, {'error': 'Server busy, please try again'})
+                return
+            try:
+                if self.path == '/api/sessions':
+                    self.send_json(201, service.start_session())
+                    return
+
+                match = SESSION_ROUTE.match(self.path)
+                if not match:
+                    raise ApiError(404, "Not found")
+                session = service.sessions.get(match.group(1))
+                self.send_json(200, session_actions[match.group(2)](session, payload))
+            except ApiError as e:
+                self.send_json(e.status, {'error': e.message})
+            except Exception as e:
+                print(f"⚠️  Error handling {self.path}: {e}")
+                self.send_json(500, {'error': 'Internal server error'})
+            finally:
+                slots.release()
+
+        def read_json(self):
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                self.close_connection = True
+                raise ApiError(400, "Invalid Content-Length")
+            if length > MAX_REQUEST_BYTES:
+                # Don't read an oversized body; drop the connection after replying instead
+                self.close_connection = True
+                raise ApiError(413, "Request body too large")
+            if not length:
+                return {}
+            try:
+                payload = json.loads(self.rfile.read(length).decode('utf-8'))
+            except ValueError:
+                raise ApiError(400, "Request body must be JSON")
+            if not isinstance(payload, dict):
+                raise ApiError(400, "Request body must be a JSON object")
+            return payload
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if self.close_connection:
+                self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_static(self, file_name, content_type):
+            try:
+                with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name), 'rb') as file:
+                    body = file.read()
+            except FileNotFoundError:
+                self.send_json(404, {'error': 'Not found'})
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            print(f"🌐 {self.address_string()} {format % args}")
+
+    return CheckinRequestHandler
+
+def run_server(host='127.0.0.1', port=8000, max_concurrent=DEFAULT_MAX_CONCURRENT_REQUESTS,
+               idle_timeout=DEFAULT_SESSION_IDLE_TIMEOUT, max_sessions=DEFAULT_MAX_SESSIONS):
+    """Initialize shared resources and serve check-in sessions until interrupted"""
+    print("=" * 60)
+    print("🧠 Mental Health Check-in Server")
+    print("=" * 60)
+
+    collection, openai_client, embedding_backend, protocol_index = initialize_resources()
+    sessions = SessionStore(idle_timeout=idle_timeout, max_sessions=max_sessions)
+    service = CheckinService(collection, openai_client, embedding_backend, protocol_index, sessions)
+    sessions.start_reaper()
+
+    server = ThreadingHTTPServer((host, port), make_handler(service, max_concurrent))
+    server.daemon_threads = True
+    print(f"🚀 Serving on http://{host}:{port} (max {max_concurrent} concurrent requests)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
+
+def parse_args():
+    """Parse command-line options for the server"""
+    parser = argparse.ArgumentParser(description="Multi-session check-in server for the web front-end")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                        help="maximum number of requests processed at once")
+    parser.add_argument("--idle-timeout", type=int, default=DEFAULT_SESSION_IDLE_TIMEOUT,
+                        help="seconds of inactivity before a session is evicted")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_server(args.host, args.port, args.max_concurrent, args.idle_timeout, args.max_sessions)
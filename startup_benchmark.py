@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures cold-start time of the check-in chatbot: wall time from launching
+`python app.py` to the first journaling prompt in stage 1, over several fresh
+processes. Also times a bare import of app.py and build_database.py, and can
+list the slowest module imports (python -X importtime).
+
+No API calls are made; a placeholder OPENAI_API_KEY is used when none is set.
+
+Run with: python startup_benchmark.py --runs 10 --importtime
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# Printed by stage1_journaling right before it waits for input
+FIRST_PROMPT_MARKER = "Start writing"
+LAUNCH_TIMEOUT_SECONDS = 60
+
+def benchmark_environment():
+    """Environment for child processes: unbuffered output and a placeholder API key"""
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    env.setdefault("OPENAI_API_KEY", "sk-startup-benchmark")
+    return env
+
+def time_to_first_prompt(script="app.py"):
+    """Launch script once and return seconds until the first stage 1 prompt is printed"""
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=benchmark_environment(),
+        text=True,
+        encoding="utf-8"
+    )
+    timer = threading.Timer(LAUNCH_TIMEOUT_SECONDS, process.kill)
+    timer.start()
+    try:
+        for line in process.stdout:
+            if FIRST_PROMPT_MARKER in line:
+                return time.perf_counter() - start_time
+        raise RuntimeError(f"{script} exited before reaching the first prompt")
+    finally:
+        timer.cancel()
+        process.kill()
+        process.wait()
+
+def time_import(module_name):
+    """Return seconds to start a fresh interpreter and import module_name"""
+    start_time = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module_name}"], env=benchmark_environment(),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start_time
+
+def slowest_imports(module_name, top=10):
+    """Return [(cumulative_seconds, module)] for the slowest imports triggered by importing module_name"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+                            env=benchmark_environment(), capture_output=True, text=True)
+    timings = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        timings.append((int(parts[1]) / 1_000_000, parts[2].strip()))
+    return sorted(timings, reverse=True)[:top]
+
+def print_timings(label, samples):
+    """Print min / median / max for a list of durations in seconds"""
+    print(f"{label:<28} min {min(samples) * 1000:7.0f} ms   median {statistics.median(samples) * 1000:7.0f} ms   "
+          f"max {max(samples) * 1000:7.0f} ms")
+
+def run_startup_benchmark(runs, show_importtime=False):
+    """Run the startup benchmark and print a summary"""
+    print("=" * 60)
+    print(f"🚀 Startup Benchmark ({runs} runs)")
+    print("=" * 60)
+
+    try:
+        first_prompt = [time_to_first_prompt() for _ in range(runs)]
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print_timings("launch → first prompt", first_prompt)
+
+    for module_name in ("app", "build_database"):
+        try:
+            samples = [time_import(module_name) for _ in range(runs)]
+        except subprocess.CalledProcessError:
+            print(f"⚠️  Could not import {module_name}")
+            continue
+        print_timings(f"import {module_name}", samples)
+
+    if show_importtime:
+        print("\n🐢 Slowest imports for app.py (cumulative):")
+        for seconds, module_name in slowest_imports("app"):
+            print(f"   {seconds * 1000:7.1f} ms  {module_name}")
+
+def parse_args():
+    """Parse command-line options for the startup benchmark"""
+    parser = argparse.ArgumentParser(description="Measure time from launching app.py to its first prompt")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh processes to launch")
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest module imports")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_startup_benchmark(args.runs, args.importtime)
@@ -0,0 +1,289 @@
+"""
+Tracing
+Lightweight nested spans and metrics for the check-in flow.
+
+    with span('chroma.query', purpose='question') as current:
+        results = collection.query(...)
+        current.set(results=len(results['ids'][0]))
+
+Spans nest through contextvars, so they follow asyncio tasks and
+asyncio.to_thread calls. Per-span-name counts, latency histograms, token
+counts, cache hits, time to first token (the time_to_first_token_ms
+attribute) and answer sources (the source attribute) are aggregated in
+process and written as a Prometheus text-format metrics file every
+FLUSH_EVERY_SPANS spans and at exit. Overhead is a few microseconds per span, so tracing is on by default.
+
+Exporting every finished span to a JSONL trace file is opt-in. Exported
+spans are buffered in memory and appended in batches; once the file reaches
+CHECKIN_TRACE_MAX_BYTES it is rotated to trace.jsonl.1 (replacing the
+previous one), so at most twice that much is kept on disk.
+
+Environment:
+    CHECKIN_TRACE=0                        disable tracing
+    CHECKIN_TRACE_EXPORT=1                 also write spans to the JSONL trace file
+    CHECKIN_TRACE_PATH=./traces/trace.jsonl
+    CHECKIN_TRACE_MAX_BYTES=52428800
+    CHECKIN_METRICS_PATH=./traces/metrics.prom
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+
+TRACE_ENABLED = os.getenv('CHECKIN_TRACE', '1') != '0'
+TRACE_EXPORT = os.getenv('CHECKIN_TRACE_EXPORT', '0') == '1'
+TRACE_PATH = os.getenv('CHECKIN_TRACE_PATH', './traces/trace.jsonl')
+TRACE_MAX_BYTES = int(os.getenv('CHECKIN_TRACE_MAX_BYTES', str(50 * 1024 * 1024)))
+METRICS_PATH = os.getenv('CHECKIN_METRICS_PATH', './traces/metrics.prom')
+FLUSH_EVERY_SPANS = 256
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    """One timed operation with attributes; use via span() as a context manager"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'start_time', 'start_counter',
+                 'duration', 'error', '_token')
+
+    def __init__(self, name, attributes):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        """Add or update span attributes"""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start_time = time.time()
+        self.start_counter = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self.start_counter
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        recorder.record(self)
+        return False
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start_time, 6),
+            'duration_ms': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+class _NoopSpan:
+    """Stand-in used when tracing is disabled"""
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class _SpanMetrics:
+    """Aggregated metrics for one span name"""
+
+    __slots__ = ('count', 'errors', 'total_seconds', 'buckets', 'tokens', 'cache_hits', 'cache_misses',
+                 'ttft_count', 'ttft_seconds', 'ttft_buckets', 'sources')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.tokens = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.ttft_count = 0
+        self.ttft_seconds = 0.0
+        self.ttft_buckets = [0] * len(LATENCY_BUCKETS)
+        self.sources = {}
+
+class TraceRecorder:
+    """Aggregates metrics from finished spans and writes them to disk
+
+    Spans themselves are only buffered and exported when trace_path is set.
+    """
+
+    def __init__(self, trace_path=None, metrics_path=METRICS_PATH, max_trace_bytes=TRACE_MAX_BYTES):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.max_trace_bytes = max_trace_bytes
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._unflushed = 0
+        self._metrics = {}
+
+    def record(self, finished_span):
+        with self._lock:
+            if self.trace_path:
+                self._buffer.append(finished_span)
+            self._unflushed += 1
+            metrics = self._metrics.get(finished_span.name)
+            if metrics is None:
+                metrics = self._metrics[finished_span.name] = _SpanMetrics()
+
+            metrics.count += 1
+            metrics.total_seconds += finished_span.duration
+            if finished_span.error:
+                metrics.errors += 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if finished_span.duration <= bound:
+                    metrics.buckets[i] += 1
+
+            for key, value in finished_span.attributes.items():
+                if key.endswith('_tokens') and isinstance(value, (int, float)):
+                    kind = key[:-len('_tokens')]
+                    metrics.tokens[kind] = metrics.tokens.get(kind, 0) + value
+            metrics.cache_hits += finished_span.attributes.get('cache_hits', 0) or 0
+            metrics.cache_misses += finished_span.attributes.get('cache_misses', 0) or 0
+            if 'cache_hit' in finished_span.attributes:
+                if finished_span.attributes['cache_hit']:
+                    metrics.cache_hits += 1
+                else:
+                    metrics.cache_misses += 1
+
+            ttft_ms = finished_span.attributes.get('time_to_first_token_ms')
+            if isinstance(ttft_ms, (int, float)):
+                ttft = ttft_ms / 1000
+                metrics.ttft_count += 1
+                metrics.ttft_seconds += ttft
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if ttft <= bound:
+                        metrics.ttft_buckets[i] += 1
+            source = finished_span.attributes.get('source')
+            if isinstance(source, str):
+                metrics.sources[source] = metrics.sources.get(source, 0) + 1
+
+            should_flush = self._unflushed >= FLUSH_EVERY_SPANS
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Append buffered spans to the trace file and rewrite the metrics file"""
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+            self._unflushed = 0
+            metrics_text = self._render_metrics()
+
+        try:
+            if spans:
+                self._ensure_directory(self.trace_path)
+                self._rotate_trace()
+                with open(self.trace_path, 'a', encoding='utf-8') as file:
+                    file.write(''.join(json.dumps(s.to_dict(), default=str) + '\n' for s in spans))
+            if metrics_text:
+                self._ensure_directory(self.metrics_path)
+                temp_path = f"{self.metrics_path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    file.write(metrics_text)
+                os.replace(temp_path, self.metrics_path)
+        except OSError as e:
+            print(f"⚠️  Could not write trace data: {e}")
+
+    def _render_metrics(self):
+        """Render aggregated metrics in Prometheus text exposition format"""
+        if not self._metrics:
+            return ""
+        lines = [
+            "# HELP checkin_span_duration_seconds Duration of traced check-in operations.",
+            "# TYPE checkin_span_duration_seconds histogram"
+        ]
+        for name, metrics in sorted(self._metrics.items()):
+            for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                lines.append(f'checkin_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'checkin_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {metrics.count}')
+            lines.append(f'checkin_span_duration_seconds_sum{{span="{name}"}} {metrics.total_seconds:.6f}')
+            lines.append(f'checkin_span_duration_seconds_count{{span="{name}"}} {metrics.count}')
+
+        lines += ["# HELP checkin_span_errors_total Traced operations that raised.",
+                  "# TYPE checkin_span_errors_total counter"]
+        for name, metrics in sorted(self._metrics.items()):
+            lines.append(f'checkin_span_errors_total{{span="{name}"}} {metrics.errors}')
+
+        lines += ["# HELP checkin_tokens_total Tokens reported by traced OpenAI calls.",
+                  "# TYPE checkin_tokens_total counter"]
+        for name, metrics in sorted(self._metrics.items()):
+            for kind, total in sorted(metrics.tokens.items()):
+                lines.append(f'checkin_tokens_total{{span="{name}",kind="{kind}"}} {total}')
+
+        lines += ["# HELP checkin_cache_lookups_total Cache lookups made inside traced operations.",
+                  "# TYPE checkin_cache_lookups_total counter"]
+        for name, metrics in sorted(self._metrics.items()):
+            if metrics.cache_hits or metrics.cache_misses:
+                lines.append(f'checkin_cache_lookups_total{{span="{name}",result="hit"}} {metrics.cache_hits}')
+                lines.append(f'checkin_cache_lookups_total{{span="{name}",result="miss"}} {metrics.cache_misses}')
+
+        lines += ["# HELP checkin_time_to_first_token_seconds Time to the first streamed token.",
+                  "# TYPE checkin_time_to_first_token_seconds histogram"]
+        for name, metrics in sorted(self._metrics.items()):
+            if not metrics.ttft_count:
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, metrics.ttft_buckets):
+                lines.append(f'checkin_time_to_first_token_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+            lines.append(f'checkin_time_to_first_token_seconds_bucket{{span="{name}",le="+Inf"}} {metrics.ttft_count}')
+            lines.append(f'checkin_time_to_first_token_seconds_sum{{span="{name}"}} {metrics.ttft_seconds:.6f}')
+            lines.append(f'checkin_time_to_first_token_seconds_count{{span="{name}"}} {metrics.ttft_count}')
+
+        lines += ["# HELP checkin_span_source_total Traced operations by the source that answered them "
+                  "(e.g. how GAD-7 answers were scored).",
+                  "# TYPE checkin_span_source_total counter"]
+        for name, metrics in sorted(self._metrics.items()):
+            for source, total in sorted(metrics.sources.items()):
+                lines.append(f'checkin_span_source_total{{span="{name}",source="{source}"}} {total}')
+
+        return "\n".join(lines) + "\n"
+
+    def _rotate_trace(self):
+        """Move a full trace file aside to trace_path.1, replacing the previous one"""
+        try:
+            if os.path.getsize(self.trace_path) >= self.max_trace_bytes:
+                os.replace(self.trace_path, f"{self.trace_path}.1")
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _ensure_directory(path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+recorder = TraceRecorder(TRACE_PATH if TRACE_EXPORT else None)
+if TRACE_ENABLED:
+    atexit.register(recorder.flush)
+
+def span(name, **attributes):
+    """Start a span as a context manager; nested spans record their parent automatically"""
+    if not TRACE_ENABLED:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+def current_span():
+    """Return the innermost active span, or a no-op span outside any span"""
+    return _current_span.get() or _NOOP_SPAN
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Vector Backend Benchmark
+Compares the ChromaDB PersistentClient with the memory-mapped snapshot
+(vector_snapshot.py) on the same data: time to import and open, per-query
+latency, and peak resident memory of a process that only does retrieval.
+
+Each backend runs in a fresh worker process so imports and RSS are measured
+in isolation. Query vectors are the stored chunk vectors with a little noise
+added, so no OpenAI calls are made; the parent builds them once and sends them
+to each worker as JSON on stdin, so no worker opens the snapshot unless it is
+the backend being measured. Run build_database.py first.
+
+Run with: python vector_benchmark.py --queries 500 --n-results 3
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+BACKENDS = ("chroma", "snapshot")
+
+def load_query_vectors(count, seed=7):
+    """Stored vectors from the snapshot, perturbed slightly, cycled up to count queries"""
+    import numpy as np
+    from vector_snapshot import SnapshotCollection
+
+    snapshot = SnapshotCollection()
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, snapshot.rows, size=count)
+    queries = snapshot.dequantize(rows) + rng.normal(0, 0.01, size=(count, snapshot.dimensions)).astype('float32')
+    return queries.tolist()
+
+def open_backend(backend):
+    """Import and open one backend; returns a collection"""
+    if backend == "chroma":
+        import chromadb
+        client = chromadb.PersistentClient(path="./db")
+        return client.get_collection("mental_health_support", embedding_function=None)
+    from vector_snapshot import SnapshotCollection
+    return SnapshotCollection()
+
+def run_worker(backend, n_results):
+    """Benchmark one backend on query vectors read from stdin and print a JSON result line"""
+    queries = json.load(sys.stdin)
+
+    start_time = time.perf_counter()
+    collection = open_backend(backend)
+    open_seconds = time.perf_counter() - start_time
+
+    latencies = []
+    top_ids = []
+    for query in queries:
+        query_start = time.perf_counter()
+        results = collection.query(query_embeddings=[query], n_results=n_results)
+        latencies.append(time.perf_counter() - query_start)
+        top_ids.append(results['ids'][0])
+
+    latencies.sort()
+    print(json.dumps({
+        'backend': backend,
+        'open_seconds': open_seconds,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'top_ids': top_ids
+    }))
+
+def run_vector_benchmark(query_count, n_results):
+    """Run every backend in a worker process and print a comparison table"""
+    print("=" * 60)
+    print(f"📦 Vector Backend Benchmark ({query_count} queries, top {n_results})")
+    print("=" * 60)
+
+    queries = json.dumps(load_query_vectors(query_count))
+    results = {}
+    for backend in BACKENDS:
+        completed = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, "--n-results", str(n_results)],
+            input=queries, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            print(f"⚠️  {backend} worker failed:\n{completed.stderr.strip()}")
+            continue
+        results[backend] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print(f"{'Backend':<10} {'Open (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'Peak RSS (MB)':>14}")
+    print("-" * 58)
+    for backend, result in results.items():
+        print(f"{backend:<10} {result['open_seconds'] * 1000:>10.1f} {result['p50_ms']:>10.3f} "
+              f"{result['p95_ms']:>10.3f} {result['max_rss_mb']:>14.1f}")
+
+    if len(results) == len(BACKENDS):
+        # Chroma's HNSW index is approximate, so a small mismatch is expected
+        agreement = [
+            len(set(chroma_ids) & set(snapshot_ids)) / max(1, len(chroma_ids))
+            for chroma_ids, snapshot_ids in zip(results['chroma']['top_ids'], results['snapshot']['top_ids'])
+        ]
+        print(f"\n🎯 Top-{n_results} overlap between backends: {sum(agreement) / len(agreement):.1%}")
+
+def parse_args():
+    """Parse command-line options for the vector benchmark"""
+    parser = argparse.ArgumentParser(description="Compare ChromaDB and the memory-mapped snapshot backend")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries per backend")
+    parser.add_argument("--n-results", type=int, default=3, help="results per query")
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.worker:
+        run_worker(args.worker, args.n_results)
+    else:
+        run_vector_benchmark(args.queries, args.n_results)
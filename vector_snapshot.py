@@ -0,0 +1,404 @@
+"""
+Vector Snapshot
+A compact, read-only, memory-mapped export of the mental_health_support
+collection, and a brute-force retrieval backend over it.
+
+build_database.py writes the snapshot after every build. app.py opens it
+instead of chromadb.PersistentClient when VECTOR_BACKEND=snapshot, so chromadb
+never has to be imported and every app process shares one page-cached copy of
+the file.
+
+File layout (little-endian):
+
+    b'VSNAP001'                 magic
+    uint64                      header length
+    header                      UTF-8 JSON: collection metadata, row count,
+                                dimensions, dtype and section offsets
+    padding                     to a 64-byte boundary
+    vectors                     contiguous rows x dimensions matrix stored as
+                                float32, float16 or int8
+    scales                      (int8 only) one float32 scale per row
+    ids / documents / metadatas string columns, each stored as uint64 end
+                                offsets (one per row) followed by UTF-8 bytes;
+                                metadatas are JSON objects
+
+SnapshotCollection.query() takes the same arguments and returns the same
+nested-list dict as Chroma's Collection.query(), so search_knowledge_base
+and the retrieve_* helpers work unchanged. Distances are squared L2, matching
+Chroma's default space, and are computed against the stored (compressed)
+vectors: int8 rows are symmetric per-row quantized (row ~= scale * int8 values)
+and their dot products are rescaled by the row scale. measure_recall() checks
+how closely compressed top-k matches exact float32 search.
+
+The snapshot is written a page of rows at a time (SnapshotWriter), so
+exporting a large collection doesn't need it all in memory.
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+VECTOR_SNAPSHOT_PATH = os.getenv('VECTOR_SNAPSHOT_PATH', './db/vectors.snapshot')
+SNAPSHOT_MAGIC = b'VSNAP001'
+SNAPSHOT_ALIGNMENT = 64
+STRING_COLUMNS = ('ids', 'documents', 'metadatas')
+SNAPSHOT_DTYPES = ('float32', 'float16', 'int8')
+
+# Rows scored per block, bounding the float32 temporaries made from compressed rows
+SCORE_BLOCK_ROWS = 8192
+# Rows read from Chroma per get() when exporting or checking recall
+EXPORT_PAGE_ROWS = 1000
+# Stored vectors used as queries by measure_recall
+RECALL_SAMPLE_ROWS = 256
+
+def _align(offset):
+    return (offset + SNAPSHOT_ALIGNMENT - 1) // SNAPSHOT_ALIGNMENT * SNAPSHOT_ALIGNMENT
+
+def quantize_vectors(vectors, dtype):
+    """Convert a float32 matrix to the stored dtype; returns (stored, per-row scales or None)"""
+    if dtype == 'float32':
+        return vectors, None
+    if dtype == 'float16':
+        return vectors.astype('<f2'), None
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        stored = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype('i1')
+        return stored, scales.astype('<f4')
+    raise ValueError(f"Unsupported snapshot dtype: {dtype} (choose from {', '.join(SNAPSHOT_DTYPES)})")
+
+class SnapshotWriter:
+    """Writes a snapshot file from rows added in pages, holding only one page in memory
+
+    Each section is spooled to an anonymous temporary file next to the
+    snapshot as rows arrive; finish() lays the sections out after the header
+    and atomically replaces the snapshot, so readers with the old file mapped
+    keep working.
+    """
+
+    def __init__(self, path=VECTOR_SNAPSHOT_PATH, dtype='float32'):
+        if dtype not in SNAPSHOT_DTYPES:
+            raise ValueError(f"Unsupported snapshot dtype: {dtype} (choose from {', '.join(SNAPSHOT_DTYPES)})")
+        self.path = path
+        self.dtype = dtype
+        self.rows = 0
+        self.dimensions = None
+        self.directory = os.path.dirname(path)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        section_names = ['vectors'] + (['scales'] if dtype == 'int8' else [])
+        section_names += [f"{name}.{part}" for name in STRING_COLUMNS for part in ('ends', 'data')]
+        self._spools = {name: tempfile.TemporaryFile(dir=self.directory or None) for name in section_names}
+        self._column_sizes = dict.fromkeys(STRING_COLUMNS, 0)
+
+    def add(self, ids, embeddings, documents, metadatas):
+        """Append one page of rows"""
+        if len(ids) == 0:
+            return
+        vectors = np.ascontiguousarray(np.asarray(embeddings, dtype='<f4'))
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings must be a rows x dimensions matrix with one row per id")
+        if self.dimensions is None:
+            self.dimensions = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dimensions:
+            raise ValueError(f"expected {self.dimensions}-dimensional embeddings, got {vectors.shape[1]}")
+
+        stored, scales = quantize_vectors(vectors, self.dtype)
+        self._spools['vectors'].write(stored.tobytes())
+        if scales is not None:
+            self._spools['scales'].write(scales.tobytes())
+
+        values = {
+            'ids': ids,
+            'documents': documents,
+            'metadatas': (json.dumps(metadata or {}, ensure_ascii=False) for metadata in metadatas)
+        }
+        for name in STRING_COLUMNS:
+            encoded = [value.encode('utf-8') for value in values[name]]
+            # End offsets run on across pages
+            ends = self._column_sizes[name] + np.cumsum([len(value) for value in encoded], dtype='<u8')
+            self._column_sizes[name] = int(ends[-1])
+            self._spools[f"{name}.ends"].write(ends.astype('<u8').tobytes())
+            self._spools[f"{name}.data"].write(b''.join(encoded))
+        self.rows += len(ids)
+
+    def finish(self, collection_metadata=None):
+        """Write the snapshot file and return its header"""
+        # Each string column is its ends followed by its data, as one section
+        sections = [('vectors', ['vectors'])]
+        if 'scales' in self._spools:
+            sections.append(('scales', ['scales']))
+        sections += [(name, [f"{name}.ends", f"{name}.data"]) for name in STRING_COLUMNS]
+
+        header = {
+            'version': 1,
+            'collection_metadata': collection_metadata or {},
+            'rows': self.rows,
+            'dimensions': self.dimensions or 0,
+            'dtype': self.dtype,
+            'sections': {}
+        }
+        # Leave room after the header for the section offsets, which are added to it below
+        offset = _align(len(SNAPSHOT_MAGIC) + 8 + len(json.dumps(header, ensure_ascii=False).encode('utf-8')) + 256)
+        for name, parts in sections:
+            length = sum(self._spools[part].tell() for part in parts)
+            header['sections'][name] = [offset, length]
+            offset = _align(offset + length)
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'wb') as file:
+                file.write(SNAPSHOT_MAGIC + struct.pack('<Q', len(header_bytes)) + header_bytes)
+                for name, parts in sections:
+                    file.seek(header['sections'][name][0])
+                    for part in parts:
+                        spool = self._spools[part]
+                        spool.seek(0)
+                        shutil.copyfileobj(spool, file)
+                # Empty trailing sections must still lie within the file for mmap
+                file.truncate(offset)
+            os.replace(temp_path, self.path)
+        finally:
+            self.close()
+        return header
+
+    def close(self):
+        for spool in self._spools.values():
+            spool.close()
+
+def write_snapshot(ids, embeddings, documents, metadatas, collection_metadata=None, path=VECTOR_SNAPSHOT_PATH,
+                   dtype='float32'):
+    """Atomically write a snapshot file from in-memory rows; returns the header"""
+    writer = SnapshotWriter(path, dtype)
+    writer.add(ids, embeddings, documents, metadatas)
+    return writer.finish(collection_metadata)
+
+def iter_collection_pages(collection, include, page_size=EXPORT_PAGE_ROWS):
+    """Yield collection.get() results page_size rows at a time, in storage order"""
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=page_size, offset=offset)
+        if page['ids']:
+            yield page
+        if len(page['ids']) < page_size:
+            return
+        offset += page_size
+
+def export_collection_snapshot(collection, path=VECTOR_SNAPSHOT_PATH, dtype='float32', page_size=EXPORT_PAGE_ROWS):
+    """Export every row of a Chroma collection to a snapshot file a page at a time; returns the header"""
+    writer = SnapshotWriter(path, dtype)
+    try:
+        for page in iter_collection_pages(collection, ['embeddings', 'documents', 'metadatas'], page_size):
+            writer.add(page['ids'], page['embeddings'], page['documents'], page['metadatas'])
+    except BaseException:
+        writer.close()
+        raise
+    return writer.finish(collection.metadata)
+
+def metadata_matches(metadata, where):
+    """Evaluate a Chroma where filter made of equality conditions and $and"""
+    if '$and' in where:
+        return all(metadata_matches(metadata, condition) for condition in where['$and'])
+    return all(metadata.get(key) == value for key, value in where.items())
+
+class SnapshotCollection:
+    """Read-only, Chroma-compatible collection backed by a memory-mapped snapshot"""
+
+    def __init__(self, path=VECTOR_SNAPSHOT_PATH, name='mental_health_support'):
+        self.path = path
+        self.name = name
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a vector snapshot")
+        header_length = struct.unpack_from('<Q', self._mmap, len(SNAPSHOT_MAGIC))[0]
+        header_start = len(SNAPSHOT_MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_length].decode('utf-8'))
+        self.metadata = self.header['collection_metadata']
+        self.rows = self.header['rows']
+        self.dimensions = self.header['dimensions']
+
+        self.dtype = self.header.get('dtype', 'float32')
+
+        vectors_offset, _ = self.header['sections']['vectors']
+        stored_dtype = {'float32': '<f4', 'float16': '<f2', 'int8': 'i1'}[self.dtype]
+        self.vectors = np.frombuffer(self._mmap, dtype=stored_dtype, count=self.rows * self.dimensions,
+                                     offset=vectors_offset).reshape(self.rows, self.dimensions)
+        self.scales = None
+        if self.dtype == 'int8':
+            scales_offset, _ = self.header['sections']['scales']
+            self.scales = np.frombuffer(self._mmap, dtype='<f4', count=self.rows, offset=scales_offset)
+
+        # Squared norms of the stored rows for L2 distances; small enough to keep in process memory
+        self._squared_norms = np.concatenate([
+            np.einsum('ij,ij->i', block, block) for block in self._dequantized_blocks()
+        ]) if self.rows else np.zeros(0, dtype='<f4')
+        self._columns = {name: self._open_column(name) for name in STRING_COLUMNS}
+        self._id_rows = None
+
+    def _open_column(self, name):
+        offset, _ = self.header['sections'][name]
+        ends = np.frombuffer(self._mmap, dtype='<u8', count=self.rows, offset=offset)
+        return ends, offset + ends.nbytes
+
+    def _column_value(self, name, row):
+        ends, data_start = self._columns[name]
+        start = int(ends[row - 1]) if row else 0
+        return self._mmap[data_start + start:data_start + int(ends[row])].decode('utf-8')
+
+    def count(self):
+        return self.rows
+
+    def _dequantized_blocks(self):
+        """Yield the stored rows as float32 blocks of at most SCORE_BLOCK_ROWS rows"""
+        for start in range(0, self.rows, SCORE_BLOCK_ROWS):
+            block = self.vectors[start:start + SCORE_BLOCK_ROWS].astype('<f4')
+            if self.scales is not None:
+                block *= self.scales[start:start + SCORE_BLOCK_ROWS, None]
+            yield block
+
+    def dequantize(self, rows=None):
+        """Return stored rows (all, or the given indices) as a float32 matrix"""
+        if rows is None:
+            return np.concatenate(list(self._dequantized_blocks())) if self.rows else self.vectors.astype('<f4')
+        block = self.vectors[rows].astype('<f4')
+        if self.scales is not None:
+            block *= self.scales[rows, None]
+        return block
+
+    def _dot_products(self, queries):
+        """queries @ stored rows.T, with int8 scales applied after each block's integer-valued dot product"""
+        if self.dtype == 'float32':
+            return queries @ self.vectors.T
+        products = []
+        for start in range(0, self.rows, SCORE_BLOCK_ROWS):
+            block = self.vectors[start:start + SCORE_BLOCK_ROWS]
+            block_products = queries @ block.astype('<f4').T
+            if self.scales is not None:
+                block_products *= self.scales[start:start + SCORE_BLOCK_ROWS]
+            products.append(block_products)
+        return np.concatenate(products, axis=1)
+
+    def top_k(self, query_vectors, n_results):
+        """Return (row indices, squared L2 distances) of the nearest rows for each query, nearest first"""
+        queries = np.asarray(query_vectors, dtype='<f4').reshape(-1, self.dimensions)
+        k = min(n_results, self.rows)
+        distances = (np.einsum('ij,ij->i', queries, queries)[:, None] + self._squared_norms[None, :]
+                     - 2.0 * self._dot_products(queries))
+        # Rounding can push a near-exact match slightly below zero
+        np.maximum(distances, 0.0, out=distances)
+        if k < self.rows:
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.tile(np.arange(self.rows), (len(queries), 1))
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        order = np.argsort(candidate_distances, axis=1)
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_distances, order, axis=1)
+
+    def query(self, query_embeddings, n_results=10, include=('documents', 'metadatas', 'distances'), **unused):
+        """Chroma-style query over the snapshot; where filters are not supported"""
+        result = {'ids': [], 'documents': None, 'metadatas': None, 'distances': None}
+        for field in ('documents', 'metadatas', 'distances'):
+            if field in include:
+                result[field] = []
+        if self.rows == 0:
+            for value in result.values():
+                if value is not None:
+                    value.extend([] for _ in query_embeddings)
+            return result
+
+        rows, distances = self.top_k(query_embeddings, n_results)
+        for query_rows, query_distances in zip(rows, distances):
+            result['ids'].append([self._column_value('ids', row) for row in query_rows])
+            if result['documents'] is not None:
+                result['documents'].append([self._column_value('documents', row) for row in query_rows])
+            if result['metadatas'] is not None:
+                result['metadatas'].append([json.loads(self._column_value('metadatas', row)) for row in query_rows])
+            if result['distances'] is not None:
+                result['distances'].append([float(distance) for distance in query_distances])
+        return result
+
+    def _row_for_id(self, chunk_id):
+        if self._id_rows is None:
+            self._id_rows = {self._column_value('ids', row): row for row in range(self.rows)}
+        return self._id_rows.get(chunk_id)
+
+    def get(self, ids=None, where=None, include=('documents', 'metadatas'), **unused):
+        """Return rows by id (unknown ids are skipped), or every row, like Collection.get()
+
+        where supports equality conditions, optionally combined with $and,
+        checked by scanning the stored metadata.
+        """
+        if ids is None:
+            rows = list(range(self.rows))
+        else:
+            rows = [row for row in (self._row_for_id(chunk_id) for chunk_id in ids) if row is not None]
+        if where:
+            rows = [row for row in rows if metadata_matches(json.loads(self._column_value('metadatas', row)), where)]
+        result = {'ids': [self._column_value('ids', row) for row in rows]}
+        if 'documents' in include:
+            result['documents'] = [self._column_value('documents', row) for row in rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [json.loads(self._column_value('metadatas', row)) for row in rows]
+        if 'embeddings' in include:
+            result['embeddings'] = self.dequantize(rows if ids is not None or where else None)
+        return result
+
+    def close(self):
+        self.vectors = None
+        self.scales = None
+        self._columns = {}
+        self._mmap.close()
+
+def measure_recall(collection, snapshot, k=3, sample_rows=RECALL_SAMPLE_ROWS, page_size=EXPORT_PAGE_ROWS):
+    """Mean recall@k of the snapshot's top-k against exact float32 search over the collection
+
+    Up to sample_rows stored vectors, spread evenly over the snapshot, are
+    used as queries, excluding themselves from both result lists, so the
+    check needs no extra embeddings. The exact top-k is found by streaming
+    the collection's float32 vectors a page at a time, so memory depends on
+    the sample and page sizes, not on the collection size.
+    """
+    k = min(k, snapshot.rows - 1)
+    if k < 1:
+        return 1.0
+
+    query_rows = np.unique(np.linspace(0, snapshot.rows - 1, min(sample_rows, snapshot.rows)).astype(np.int64))
+    row_ids = [snapshot._column_value('ids', int(row)) for row in query_rows]
+    fetched = collection.get(ids=row_ids, include=['embeddings'])
+    vectors_by_id = dict(zip(fetched['ids'], fetched['embeddings']))
+    if len(vectors_by_id) != len(row_ids):
+        raise ValueError("collection and snapshot hold different rows")
+    queries = np.asarray([vectors_by_id[chunk_id] for chunk_id in row_ids], dtype='<f4')
+
+    # Running exact top-k per query: (distances, snapshot rows)
+    best_distances = np.full((len(queries), k), np.inf, dtype='<f4')
+    best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+    row_offset = 0
+    for page in iter_collection_pages(collection, ['embeddings'], page_size):
+        vectors = np.asarray(page['embeddings'], dtype='<f4')
+        page_rows = np.arange(row_offset, row_offset + len(vectors))
+        row_offset += len(vectors)
+
+        distances = np.einsum('ij,ij->i', vectors, vectors)[None, :] - 2.0 * queries @ vectors.T
+        distances[page_rows[None, :] == query_rows[:, None]] = np.inf
+        candidates = np.concatenate([best_distances, distances], axis=1)
+        candidate_rows = np.concatenate([best_rows, np.broadcast_to(page_rows, distances.shape)], axis=1)
+        top = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+        best_distances = np.take_along_axis(candidates, top, axis=1)
+        best_rows = np.take_along_axis(candidate_rows, top, axis=1)
+
+    compressed_top, _ = snapshot.top_k(queries, k + 1)
+    recalls = []
+    for row, expected, found in zip(query_rows, best_rows, compressed_top):
+        found = [index for index in found if index != row][:k]
+        recalls.append(len(set(expected) & set(found)) / k)
+    return float(np.mean(recalls))
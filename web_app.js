@@ -17,11 +17,49 @@ class MentalHealthChatbot {
         this.currentQuestionIndex = 0;
         this.waitingForResponse = false;
         
+        // Backend session (server.py); falls back to in-browser simulation when unavailable
+        this.apiBase = window.CHECKIN_API_BASE || '';
+        this.sessionId = null;
+        
         this.initializeElements();
         this.setupEventListeners();
+        this.connectBackend();
         this.startWelcomeSequence();
     }
     
+    async connectBackend() {
+        const session = await this.apiPost('/api/sessions');
+        if (session) {
+            this.sessionId = session.session_id;
+            this.gad7Questions = session.questions;
+        }
+    }
+    
+    async apiPost(path, body = {}) {
+        try {
+            const response = await fetch(this.apiBase + path, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(body)
+            });
+            if (!response.ok) return null;
+            return await response.json();
+        } catch (error) {
+            return null;
+        }
+    }
+    
+    sessionPath(action) {
+        return `/api/sessions/${this.sessionId}/${action}`;
+    }
+    
+    // A failed session request may or may not have been recorded by the server, so the
+    // rest of the session runs in the browser rather than mixing server and local scoring
+    // (which would leave the server's question index behind the client's)
+    leaveServerMode() {
+        this.sessionId = null;
+    }
+    
     initializeElements() {
         this.chatMessages = document.getElementById('chatMessages');
         this.messageInput = document.getElementById('messageInput');
@@ -202,8 +240,13 @@ class MentalHealthChatbot {
         this.journalEntry = message;
         this.showLoading();
         
-        // Simulate processing time
-        await this.delay(2000);
+        if (this.sessionId) {
+            const saved = await this.apiPost(this.sessionPath('journal'), { text: message });
+            if (!saved) this.leaveServerMode();
+        } else {
+            // Simulate processing time
+            await this.delay(2000);
+        }
         
         this.hideLoading();
         this.addMessage("✅ Thank you for sharing!", 'bot');
@@ -216,15 +259,26 @@ class MentalHealthChatbot {
     async handleAssessmentStage(message) {
         this.showLoading();
         
-        // Simulate AI scoring
-        const score = this.simulateGAD7Scoring(message);
+        const result = this.sessionId ? await this.apiPost(this.sessionPath('answers'), { answer: message }) : null;
+        if (this.sessionId && !result) this.leaveServerMode();
+        
+        let score;
+        if (result) {
+            score = result.score;
+        } else {
+            // Simulate AI scoring
+            score = this.simulateGAD7Scoring(message);
+            await this.delay(1500);
+        }
         this.gad7Scores.push(score);
         
-        await this.delay(1500);
         this.hideLoading();
         
         // Show empathetic response for high scores
-        if (score >= 2) {
+        if (result && result.empathetic_response) {
+            this.addMessage(`💙 ${result.empathetic_response}`, 'bot');
+            await this.delay(2000);
+        } else if (score >= 2) {
             const empathyResponses = [
                 "I can hear that this has been challenging for you. Thank you for sharing.",
                 "That sounds really difficult. It takes courage to acknowledge these feelings.",
@@ -355,8 +409,11 @@ class MentalHealthChatbot {
         
         this.showLoading();
         
-        // Simulate AI processing
-        await this.delay(3000);
+        const support = this.sessionId ? await this.apiPost(this.sessionPath('support')) : null;
+        if (!support) {
+            // Simulate AI processing
+            await this.delay(3000);
+        }
         
         this.hideLoading();
         
@@ -364,8 +421,8 @@ class MentalHealthChatbot {
         
         await this.delay(1500);
         
-        // Generate personalized response
-        const response = this.generatePersonalizedResponse(totalScore);
+        // Use the server's personalized response, or generate one locally
+        const response = support ? support.summary : this.generatePersonalizedResponse(totalScore);
         this.addMessage(response);
         
         await this.delay(2000);